@@ -1,17 +1,296 @@
-import requests
+import sys
+import time
+import codecs
+import threading
+import collections
 import concurrent.futures
+from functools import partial
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from httpcache import HttpCache
+
+# (connect, read) timeout in seconds handed to requests for every fetch.
+DEFAULT_TIMEOUT = (5, 30)
+MAX_WORKERS = 16  # Global cap on requests in flight
+PER_HOST_LIMIT = 4  # Cap on requests in flight against a single host
+MAX_BODY_BYTES = 32 * 1024 * 1024  # Bodies larger than this are abandoned mid-transfer
+CHUNK_BYTES = 64 * 1024  # Bytes read and decoded at a time
+PROGRESS_INTERVAL = 0.1  # Seconds between two progress reports of one fetch
+
+_engine = None
+
+
+class FetchCancelled(Exception):
+    pass
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+class CancelToken:
+    """
+        Set by the caller to stop a fetch, whether it is still queued or halfway through its body.
+    """
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+
+class FetchResult:
+    """
+        Outcome of one completed HTTP request, detached from the requests.Response that produced it.
+
+        A 304 answered from the HttpCache has not_modified set, and its body is only read back from disk
+        if .text is actually accessed.
+    """
+    def __init__(self, url, status_code, text, headers, nbytes, elapsed, not_modified=False, loader=None):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.nbytes = nbytes
+        self.elapsed = elapsed
+        self.not_modified = not_modified
+        self._text = text
+        self._loader = loader
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code == 200 or self.not_modified
+
+    @property
+    def text(self) -> str:
+        if self._text is None and self._loader is not None:
+            self._text = self._loader()
+        return self._text
+
+    def __repr__(self):
+        return f"<FetchResult [{self.status_code}] {self.url}>"
+
+
+class BatchStats:
+    """
+        Wall-clock and throughput bookkeeping for a batch of fetches.
+    """
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.finished = None
+        self.count = 0
+        self.failed = 0
+        self.nbytes = 0
+
+    def add(self, result: FetchResult = None, error: BaseException = None):
+        self.count += 1
+        if error is not None or result is None or not result.ok:
+            self.failed += 1
+        if result is not None:
+            self.nbytes += result.nbytes
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
 
+    def summary(self) -> str:
+        elapsed = max(self.elapsed, 1e-6)
+        return f"Fetched {self.count} pages in {elapsed:.2f}s " \
+               f"({self.count / elapsed:.1f} pages/s, {self.nbytes / elapsed / 1024:.0f} KB/s), {self.failed} failed."
 
-def async_fetch(url):
-    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
-        future = executor.submit(requests.get, url)
-        concurrent.futures.wait([future, ])
+
+class FetchEngine:
+    """
+        Concurrent fetcher with a bounded worker pool, per-host connection caps and pooled keep-alive sessions.
+
+        Requests beyond the per-host cap wait in a per-host queue instead of occupying a worker,
+        so one slow site cannot starve fetches against other hosts.
+
+        Bodies are streamed in chunks and decoded as they arrive, so only the text is ever held in full.
+        A body past max_bytes, declared or actual, fails the fetch with BodyTooLarge.
+    """
+    def __init__(self, max_workers=MAX_WORKERS, per_host=PER_HOST_LIMIT, timeout=DEFAULT_TIMEOUT, cache: HttpCache = None,
+                 max_bytes=MAX_BODY_BYTES):
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self.timeout = timeout
+        self.cache = cache
+        self.max_bytes = max_bytes
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='bs-viz-fetch')
+
+        self._lock = threading.Lock()
+        self._active = {}  # host -> requests in flight
+        self._waiting = {}  # host -> deque of (future, fetch arguments) over the cap
+        self._local = threading.local()
+
+    def session(self) -> requests.Session:
+        """
+            Return the calling worker thread's session. Sessions are not shared across threads,
+            but each keeps its connections to every host alive between fetches.
+        """
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.per_host)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._local.session = session
+        return session
+
+    def fetch(self, url, timeout=None, progress=None, token: CancelToken = None) -> concurrent.futures.Future:
+        """
+            Schedule a GET request and return a future resolving to a FetchResult.
+            progress(nbytes, total), if given, is called from the worker thread as the body arrives,
+            total being None when the server does not say. Setting token stops the fetch with FetchCancelled.
+        """
+        future = concurrent.futures.Future()
+        host = urlsplit(url).netloc.lower()
+        args = (url, timeout or self.timeout, progress, token)
+
+        with self._lock:
+            if self._active.get(host, 0) < self.per_host:
+                self._active[host] = self._active.get(host, 0) + 1
+            else:
+                self._waiting.setdefault(host, collections.deque()).append((future, args))
+                return future
+
+        future.set_running_or_notify_cancel()
+        self.executor.submit(self._run, host, future, *args)
         return future
 
+    def fetch_many(self, urls, stats: BatchStats = None):
+        """
+            Fetch all urls concurrently, yielding (url, result, error) in completion order.
+        """
+        stats = stats if stats is not None else BatchStats()
+        futures = {self.fetch(url): url for url in urls}
+
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                stats.add(error=e)
+                yield futures[future], None, e
+            else:
+                stats.add(result)
+                yield futures[future], result, None
+
+        stats.finish()
+
+    def _run(self, host, future, url, timeout, progress, token):
+        try:
+            if token is not None and token.cancelled:
+                raise FetchCancelled(url)
+            result = self._get(url, timeout, progress, token)
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+        finally:
+            self._release(host)
+
+    def _get(self, url, timeout, progress=None, token=None) -> FetchResult:
+        t0 = time.perf_counter()
+        headers = self.cache.conditional_headers(url) if self.cache is not None else {}
+        with self.session().get(url, timeout=timeout, headers=headers, stream=True) as resp:
+            text, nbytes = self._read(resp, progress, token)
+        elapsed = time.perf_counter() - t0
+
+        if self.cache is None:
+            return FetchResult(url, resp.status_code, text, resp.headers, nbytes, elapsed)
+
+        entry = self.cache.hit(url) if resp.status_code == 304 and headers else None
+        if entry is not None:
+            headers = requests.structures.CaseInsensitiveDict(resp.headers)
+            headers.setdefault('Content-Type', entry['content_type'])
+            return FetchResult(url, 304, None, headers, 0, elapsed, not_modified=True, loader=partial(self.cache.load, url))
+
+        self.cache.miss()
+        if resp.status_code == 200:
+            self.cache.store(url, text, resp.headers)
+        return FetchResult(url, resp.status_code, text, resp.headers, nbytes, elapsed)
+
+    def _read(self, resp, progress, token) -> tuple[str, int]:
+        """
+            Read and decode the body of a streamed response chunk by chunk. Return (text, bytes read).
+        """
+        total = resp.headers.get('Content-Length')
+        total = int(total) if total and total.isdigit() else None
+        if total is not None and total > self.max_bytes:
+            raise BodyTooLarge(f"{resp.url} is {total} bytes, over the {self.max_bytes} bytes limit")
+
+        # As resp.text would, but without a guess from the whole body when no charset is declared
+        decoder = codecs.getincrementaldecoder(resp.encoding or 'utf-8')(errors='replace')
+        pieces = []
+        nbytes = 0
+        reported = time.perf_counter()
+        for chunk in resp.iter_content(CHUNK_BYTES):
+            if token is not None and token.cancelled:
+                raise FetchCancelled(resp.url)
+            nbytes += len(chunk)
+            if nbytes > self.max_bytes:
+                raise BodyTooLarge(f"{resp.url} is over the {self.max_bytes} bytes limit")
+            pieces.append(decoder.decode(chunk))
+            if progress is not None and time.perf_counter() - reported >= PROGRESS_INTERVAL:
+                reported = time.perf_counter()
+                progress(nbytes, total)
+        pieces.append(decoder.decode(b'', final=True))
+
+        if progress is not None:
+            progress(nbytes, total)
+        return ''.join(pieces), nbytes
+
+    def _release(self, host):
+        # Hand the host slot to the next waiting request, skipping any cancelled while queued.
+        while True:
+            with self._lock:
+                queue = self._waiting.get(host)
+                if not queue:
+                    self._waiting.pop(host, None)
+                    self._active[host] -= 1
+                    if not self._active[host]:
+                        del self._active[host]
+                    return
+                future, args = queue.popleft()
+
+            if future.set_running_or_notify_cancel():
+                self.executor.submit(self._run, host, future, *args)
+                return
+
+
+def get_engine() -> FetchEngine:
+    """
+        Return the process-wide FetchEngine, created on first use.
+    """
+    global _engine
+    if _engine is None:
+        _engine = FetchEngine(cache=HttpCache())
+    return _engine
+
+
+def async_fetch(url, timeout=None, progress=None, token: CancelToken = None) -> concurrent.futures.Future:
+    """
+        Submit a GET request to the shared engine and return its future immediately.
+        Callers are expected to attach a done callback instead of waiting on the result.
+    """
+    return get_engine().fetch(url, timeout, progress, token)
+
 
 def main():
-    res = async_fetch("https://www.hket.com")
-    print(res.done())
+    urls = sys.argv[1:] or ["https://www.hket.com"]
+    stats = BatchStats()
+    for url, result, error in get_engine().fetch_many(urls, stats):
+        print(url, result if error is None else repr(error))
+    print(stats.summary())
 
 
 if __name__ == '__main__':
@@ -1,21 +1,45 @@
 import os
+import sys
 import json
 import re
+import time
+import argparse
+import threading
+from functools import partial
 
-import pandas as pd
-import numpy as np
+STARTUP_TIME = time.perf_counter()  # Taken before the heavier imports below, for the startup report
 
+# pandas and numpy are only imported by transforms that use them, see engine.transform_namespace()
 # from PyQt6.QtGui import QAction
 from PyQt6 import QtWidgets as qt
 from PyQt6 import QtGui
-from PyQt6.QtCore import QSize, Qt, QMargins, QTimer
-from bs4 import BeautifulSoup
+from PyQt6.QtCore import QSize, Qt, QMargins, QTimer, QObject, QEvent, pyqtSignal
+
+import engine
+import parsers
+import metrics
+import crawl
+from transforms import get_runner
+from aio import get_engine, BatchStats, FetchCancelled
+from doccache import get_document_cache
+from scheduler import RefreshScheduler, REFRESH_INTERVAL
+from history import HistoryStore, widget_key, HISTORY_DB
 
 # Global Constants
 APP_VERSION = "0.1.7"
 URL_RE = re.compile(r"(ftp|http|https)://(\w+:?\w*@)?(\S+)(:\d+)?(/|/([\w#!:.?+=&%@!-/]))?")
 CONTENT_MARGINS_NARROW = QMargins(2, 0, 2, 0)  # Left, Top, Right, Bottom
 CONTENT_MARGINS_NORMAL = QMargins(2, 2, 2, 2)
+FETCH_TIMEOUT_MS = 45 * 1000  # Hard limit on one fetch, on top of the connect/read timeouts in aio
+FILTER_DEBOUNCE_MS = 200  # Quiet period after the last keystroke before a filter is evaluated
+DISPLAY_CHUNK_CHARS = 64 * 1024  # Text laid out at once in a ScrollDisplay as it is scrolled
+DISPLAY_MAX_CHARS = 1024 * 1024  # Text laid out before a ScrollDisplay asks to [Show more]
+QUEUE_VIEW_REFRESH_MS = 1000  # Update period of the Refresh Queue and Diagnostics dialogs
+LOAD_FETCH_BATCH = 4  # Off-screen widgets of a loaded config whose fetch starts per event loop pass
+LOAD_PAINT_WAIT_MS = 500  # Loaded widgets are fetched on first paint, or after this long without one
+BODY_BUILD_MARGIN = 0.5  # Widgets within this many view heights of the view get their form and display built
+BODY_DROP_MARGIN = 2  # Widgets further than this many view heights out of view have them deleted
+CRAWL_DISPLAY_MS = 250  # A crawl's merged matches are shown again at most this often as pages land
 LOREM_IPSUM = """
 Lorem ipsum dolor sit amet, consectetur adipiscing elit. Praesent finibus tortor ut viverra pretium. Fusce ut nulla libero. Aenean mattis eget nisi non pellentesque. Aenean tempus ex eget sapien rhoncus suscipit. Fusce non lectus velit. Mauris semper nisl id sapien congue, eu mollis turpis tempor. Aenean euismod libero vitae sem dapibus convallis.
 Vestibulum vel laoreet turpis. Vivamus fringilla dolor nunc. Sed varius, neque vitae gravida elementum, velit ligula aliquam augue, eu auctor arcu leo et quam. Vestibulum magna nulla, hendrerit eget ipsum quis, dictum lacinia sem. Cras suscipit ex sit amet magna laoreet vestibulum. Nam tempus quis tortor ac efficitur. Nam fermentum urna vel sem rutrum, id ultrices dolor iaculis. In massa lectus, luctus sed purus eget, aliquet imperdiet purus. Sed porttitor lectus eget tincidunt lobortis.
@@ -25,6 +49,10 @@ Ut facilisis facilisis purus non tincidunt. Cras vel sem placerat, congue mauris
 """
 
 
+def format_size(size: int) -> str:
+    return f"{size / 1024 / 1024:.1f} MB" if size >= 1024 * 1024 else f"{size / 1024:.0f} KB"
+
+
 def qt_widget_set_size(button: qt.QWidget, width: int = None, height: int = None):
     if width:
         button.setMinimumWidth(width)
@@ -79,11 +107,25 @@ class PythonBox(qt.QPlainTextEdit):
 class EntityBox(qt.QWidget):
     """
     EntityBox is a self-containing widget for scraping one URL.
+
+    Its state lives in plain attributes and its DisplayModel; the form and display widgets, its body,
+    are only built while the box is in or near the view (see MainWindow.update_bodies), so that
+    hundreds of boxes cost hundreds of empty placeholders rather than tens of thousands of widgets.
     """
 
-    # These tags are unlikely to contain useful information, or contain an array of nested information.
-    # Therefore, they are excluded during the tag parsing stage.
-    TAG_EXCLUDE = ['script', 'meta', 'head', 'noscript', 'svg', 'html', 'aside', 'main']
+    TAG_EXCLUDE = engine.TAG_EXCLUDE
+
+    # Emitted from a fetch worker thread with (fetch sequence number, completed future).
+    # Qt queues it onto the GUI thread, where on_fetch_done() runs.
+    fetch_done = pyqtSignal(int, object)
+    # Emitted from a fetch worker thread with (fetch sequence number, bytes read, total bytes or None)
+    fetch_progress = pyqtSignal(int, int, object)
+    # Emitted from the calibration thread with a list of parsers.Timing, or the exception it raised
+    calibrate_done = pyqtSignal(object)
+    # Emitted from a fetch worker thread with (crawl sequence number, crawl.CrawlPage) as each page of a crawl lands
+    crawl_page = pyqtSignal(int, object)
+    # Emitted with (crawl sequence number, crawl.Crawler) once the crawl is over
+    crawl_done = pyqtSignal(int, object)
 
     def __init__(self, parent):
 
@@ -92,29 +134,138 @@ class EntityBox(qt.QWidget):
         self.parent = parent
 
         # data
+        self.url = "https://"
+        self.filter_text = ""
+        self.transform_text = ""
         self.status_code = -1
-        self.resp_raw = None
-        self.resp_soup = None
-        self.resp_html_full = None
-        self.resp_html = None
-        self.is_with_css = True
-        self.func_transform = None
+        self.resp_url = None
+        self.resp_doc = None
+        self.resp_result = None
+        self.refresh_interval = REFRESH_INTERVAL
+        self.last_output = None  # Final text shown, after any transform
+        self.history_pending = False  # Record the next final output, i.e. that of a fresh fetch
+        self.filter_option = engine.FILTER_CSS
+        self.collapse_nested = False
+        self.func_transform = None  # Code of the transform once checked, it only runs in the TransformRunner
         self.is_with_transform = False
+        self.transform_input = engine.INPUT_TEXT
+        self.parser = engine.PARSER_LXML
+        self.is_calibrating = False
+        self.calibration = None  # Timings of the last calibration, for the Calibrate tooltip
+
+        # in-flight fetch
+        self.fetch_seq = 0
+        self.fetch_url = None
+        self.fetch_parser = None
+        self.fetch_future = None
+        self.fetch_from_cache = False  # Served by the DocumentCache without a request, nothing to time
+        self.fetch_progress_text = None
+        self.fetch_timer = QTimer(self)
+        self.fetch_timer.setSingleShot(True)
+
+        # crawl mode: follow the links matching crawl_links from url, and show the matches of every page as one
+        self.is_crawl = False
+        self.crawl_links = ""
+        self.crawl_depth = crawl.CRAWL_MAX_DEPTH
+        self.crawl_pages = crawl.CRAWL_MAX_PAGES
+        self.crawl_delay = crawl.CRAWL_HOST_DELAY
+        self.crawler: crawl.Crawler = None
+        self.crawl_matches: crawl.CrawlMatches = None
+        self.crawl_filter = None  # (filter_text, filter_option, collapse_nested) the matches were crawled with
+        self.crawl_seq = 0
+        self.crawl_timer = QTimer(self)
+        self.crawl_timer.setSingleShot(True)
+
+        # pending filter evaluation, restarted on every keystroke
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+
+        # Per-stage timings of this box, see the Diagnostics dialog
+        self.metrics = metrics.StageMetrics()
+
+        # What is displayed, kept without any widget while the box is out of view
+        self.display = DisplayModel(self, self.metrics)
+        self.body: qt.QWidget = None
+
+        # Empty until build_body(), the layout only ever holds the body
+        layout = qt.QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.setLayout(layout)
+
+        # Size
+        self.setMinimumSize(800, 210)
+        self.setMaximumSize(800, 360)
+
+        # Set reactions
+        # Queued even when emitted on the GUI thread, as a page served from the DocumentCache is, so that
+        # on_fetch_done() never runs inside requests_get()
+        self.fetch_done.connect(self.on_fetch_done, Qt.ConnectionType.QueuedConnection)
+        self.fetch_progress.connect(self.on_fetch_progress)
+        self.fetch_timer.timeout.connect(self.fetch_timeout)
+        self.filter_timer.timeout.connect(self.send_to_display)
+        self.calibrate_done.connect(self.on_calibrated)
+        self.crawl_page.connect(self.on_crawl_page)
+        self.crawl_done.connect(self.on_crawl_done)
+        self.crawl_timer.timeout.connect(self.show_crawl_result)
+        self.display.output_ready.connect(self.on_output_ready)
+
+    def build_body(self):
+        """
+            Create the form and display widgets, e.g. as the box scrolls into view, and show the box state in them.
+        """
+        if self.body is not None:
+            return
 
         # widgets
-        self.display = ScrollDisplay()
+        self.display_view = ScrollDisplay(self.display)
         self.input_url = qt.QLineEdit()
         self.input_filter = qt.QLineEdit()
         self.input_transform = PythonBox()
-
-        self.rdo_gbox_with, self.rdo_with_css, self.rdo_with_text = FormRadioButtons.new("CSS", "Text")
+        self.cmb_transform_input = qt.QComboBox()
+        self.cmb_transform_input.addItems(engine.TRANSFORM_INPUTS)
+        self.cmb_transform_input.setToolTip("What the x of the transform is")
+        self.cmb_parser = qt.QComboBox()
+        self.cmb_parser.addItems(engine.PARSERS)
+        self.cmb_parser.setToolTip("Parser backend; lxml.html is the fastest, Selector mode on it needs cssselect")
+        self.btn_calibrate = qt.QPushButton("Calibrate")
+        self.chk_crawl = qt.QCheckBox("Crawl")
+        self.chk_crawl.setToolTip("Follow the links matching the selector and show the matches of every page")
+        self.input_crawl_links = qt.QLineEdit()
+        self.input_crawl_links.setPlaceholderText("Links to follow, e.g. a.next")
+        self.spn_crawl_depth = qt.QSpinBox()
+        self.spn_crawl_depth.setRange(1, 1000)
+        self.spn_crawl_depth.setPrefix("Depth ")
+        self.spn_crawl_depth.setToolTip("Links followed from the URL, one per page of a listing")
+        self.spn_crawl_pages = qt.QSpinBox()
+        self.spn_crawl_pages.setRange(1, 10000)
+        self.spn_crawl_pages.setPrefix("Pages ")
+        self.spn_crawl_pages.setToolTip("Pages fetched at most, the URL included")
+        self.spn_crawl_delay = qt.QDoubleSpinBox()
+        self.spn_crawl_delay.setRange(0, 60)
+        self.spn_crawl_delay.setSingleStep(0.5)
+        self.spn_crawl_delay.setPrefix("Delay ")
+        self.spn_crawl_delay.setSuffix(" s")
+        self.spn_crawl_delay.setToolTip("Seconds between two requests to the site, longer if its robots.txt asks; "
+                                        "lower only for sites you may load harder")
+
+        self.rdo_gbox_with, self.rdo_with_css, self.rdo_with_text, self.rdo_with_selector = \
+            FormRadioButtons.new("CSS", "Text", "Selector")
         self.rdo_gbox_disp, self.rdo_html, self.rdo_clean, self.rdo_raw = FormRadioButtons.new("HTML", "Clean", "Raw")
+        self.chk_outermost = qt.QCheckBox("Outermost")
+        self.chk_outermost.setToolTip("Hide matches nested inside another match")
+        self.rdo_gbox_with.layout().addWidget(self.chk_outermost)
 
         self.btn_fetch = qt.QPushButton("Fetch")
         self.btn_transform = qt.QPushButton("Transform")
+        self.lbl_memory = qt.QLabel()
+        self.lbl_memory.setToolTip("Approximate memory held by the fetched page")
+        self.spn_refresh = qt.QSpinBox()
+        self.spn_refresh.setRange(1, 24 * 60)
+        self.spn_refresh.setPrefix("Every ")
+        self.spn_refresh.setSuffix(" min")
+        self.spn_refresh.setToolTip("Auto Refresh interval of this widget")
 
         self.btn_transform.setCheckable(True)
-        self.input_filter.setEnabled(False)
 
         # layout
         layout_l1 = qt.QGridLayout()
@@ -128,16 +279,30 @@ class EntityBox(qt.QWidget):
         layout_l3_form.addRow("Filter", self.input_filter)
         layout_l3_form.addRow("With", self.rdo_gbox_with)
         layout_l3_form.addRow("Display", self.rdo_gbox_disp)
+        layout_l3_parser = qt.QHBoxLayout()
+        layout_l3_parser.addWidget(self.cmb_parser, 1)
+        layout_l3_parser.addWidget(self.btn_calibrate)
+        layout_l3_form.addRow("Parser", layout_l3_parser)
+        layout_l3_crawl = qt.QHBoxLayout()
+        layout_l3_crawl.addWidget(self.chk_crawl)
+        layout_l3_crawl.addWidget(self.input_crawl_links, 1)
+        layout_l3_crawl.addWidget(self.spn_crawl_depth)
+        layout_l3_crawl.addWidget(self.spn_crawl_pages)
+        layout_l3_crawl.addWidget(self.spn_crawl_delay)
+        layout_l3_form.addRow("Follow", layout_l3_crawl)
         layout_l3_form.addRow("Transform", self.input_transform)
+        layout_l3_form.addRow("Input", self.cmb_transform_input)
 
         # Form Button
         layout_l3_btn.addWidget(self.btn_fetch)
         layout_l3_btn.addWidget(self.btn_transform)
+        layout_l3_btn.addWidget(self.spn_refresh)
+        layout_l3_btn.addWidget(self.lbl_memory)
 
         layout_l2_left.addLayout(layout_l3_form)
         layout_l2_left.addLayout(layout_l3_btn)
         layout_l1.addLayout(layout_l2_left, 0, 0)
-        layout_l1.addWidget(self.display, 0, 1)
+        layout_l1.addWidget(self.display_view, 0, 1)
         layout_l1.setColumnStretch(0, 1)
         layout_l1.setColumnStretch(1, 5)
 
@@ -145,61 +310,308 @@ class EntityBox(qt.QWidget):
         layout_l1.setContentsMargins(CONTENT_MARGINS_NARROW)
         layout_l3_form.setContentsMargins(CONTENT_MARGINS_NARROW)
 
-        # Size
-        self.setMinimumSize(800, 180)
-        self.setMaximumSize(800, 360)
-
         # Collect remaining parts
         self.form = layout_l3_form
-        self.setLayout(layout_l1)
-        self.input_url.setText("https://")
-        self.form.setRowVisible(4, False)
+        self.body = qt.QWidget()
+        self.body.setLayout(layout_l1)
+        self.fill_body()
+        self.layout().addWidget(self.body)
 
         # Set reactions
-        self.btn_fetch.clicked.connect(self.requests_get)
+        self.input_url.textChanged.connect(self.on_url_edited)
+        self.input_filter.textChanged.connect(self.on_filter_edited)
+        self.input_transform.textChanged.connect(self.on_transform_edited)
+        self.btn_fetch.clicked.connect(self.on_fetch_clicked)
         self.btn_transform.clicked.connect(self.enable_transform)
-        self.input_filter.textChanged.connect(self.send_to_display)
+        self.cmb_transform_input.currentIndexChanged.connect(self.set_transform_input)
+        self.cmb_parser.currentIndexChanged.connect(self.set_parser)
+        self.btn_calibrate.clicked.connect(self.calibrate)
         self.rdo_html.clicked.connect(self.output_html)
         self.rdo_clean.clicked.connect(self.output_clean)
         self.rdo_raw.clicked.connect(self.output_raw)
         self.rdo_with_css.clicked.connect(self.with_css)
         self.rdo_with_text.clicked.connect(self.with_text)
+        self.rdo_with_selector.clicked.connect(self.with_selector)
+        self.chk_outermost.clicked.connect(self.with_outermost)
+        self.spn_refresh.valueChanged.connect(self.set_refresh_interval)
+        self.chk_crawl.clicked.connect(self.set_crawl)
+        self.input_crawl_links.textChanged.connect(self.on_crawl_links_edited)
+        self.spn_crawl_depth.valueChanged.connect(self.set_crawl_depth)
+        self.spn_crawl_pages.valueChanged.connect(self.set_crawl_pages)
+        self.spn_crawl_delay.valueChanged.connect(self.set_crawl_delay)
+
+    def fill_body(self):
+        """
+            Show the box state in the body widgets, without triggering their reactions.
+        """
+        if self.body is None:
+            return
+
+        # Signals of the children are only connected once the body is filled the first time
+        signalling = (self.input_url, self.input_filter, self.input_transform, self.spn_refresh,
+                      self.cmb_transform_input, self.cmb_parser, self.input_crawl_links, self.spn_crawl_depth,
+                      self.spn_crawl_pages, self.spn_crawl_delay)
+        for widget in signalling:
+            widget.blockSignals(True)
+        self.input_url.setText(self.url)
+        self.input_filter.setText(self.filter_text)
+        self.input_transform.setPlainText(self.transform_text)
+        self.spn_refresh.setValue(max(1, round(self.refresh_interval / 60)))
+        self.cmb_transform_input.setCurrentIndex(self.transform_input)
+        self.cmb_parser.setCurrentIndex(engine.PARSERS.index(self.parser))
+        self.input_crawl_links.setText(self.crawl_links)
+        self.spn_crawl_depth.setValue(self.crawl_depth)
+        self.spn_crawl_pages.setValue(self.crawl_pages)
+        self.spn_crawl_delay.setValue(self.crawl_delay)
+        for widget in signalling:
+            widget.blockSignals(False)
+
+        if self.filter_option == engine.FILTER_CSS:
+            self.rdo_with_css.setChecked(True)
+        elif self.filter_option == engine.FILTER_TEXT:
+            self.rdo_with_text.setChecked(True)
+        elif self.filter_option == engine.FILTER_SELECTOR:
+            self.rdo_with_selector.setChecked(True)
+
+        if self.display.output_option == 0:
+            self.rdo_html.setChecked(True)
+        elif self.display.output_option == 1:
+            self.rdo_clean.setChecked(True)
+        elif self.display.output_option == 2:
+            self.rdo_raw.setChecked(True)
 
-    def requests_get(self, _=None):
+        self.chk_outermost.setChecked(self.collapse_nested)
+        self.chk_crawl.setChecked(self.is_crawl)
+        self.input_filter.setEnabled(self.status_code == 200 or self.is_crawl)
+        self.btn_transform.setChecked(self.is_with_transform)
+        self.form.setRowVisible(self.input_transform, self.is_with_transform)
+        self.form.setRowVisible(self.cmb_transform_input, self.is_with_transform)
+        self.update_calibrate_button()
+        self.update_fetch_button()
+        self.update_memory_readout()
+
+    def drop_body(self):
         """
-            Given URL in self.input_url.text(), blocking fetch and display content.
+            Delete the form and display widgets, e.g. once the box is far out of view. The box state is kept.
         """
+        if self.body is None:
+            return
+
+        self.layout().removeWidget(self.body)
+        self.body.deleteLater()
+        self.body = None
+        self.display_view = None
 
-        if not bool(URL_RE.match(self.input_url.text())):
+    def on_url_edited(self, text):
+        self.url = text
+
+    def on_filter_edited(self, text):
+        self.filter_text = text
+        self.schedule_filter()
+
+    def on_transform_edited(self):
+        self.transform_text = self.input_transform.document().toPlainText()
+        if self.is_with_transform:
+            self.get_from_input_and_set_transform()
+
+    @property
+    def resp_raw(self) -> str:
+        return self.resp_doc.text if self.resp_doc is not None else None
+
+    @property
+    def resp_soup(self):
+        return self.resp_doc.soup if self.resp_doc is not None else None
+
+    @property
+    def resp_html_full(self) -> str:
+        # Prettified on first use, i.e. the first time the filter is empty
+        return self.resp_doc.prettified if self.resp_doc is not None else None
+
+    def requests_get(self, _=None, targeted: bool = False):
+        """
+            Given URL in self.url, fetch content in the background.
+            Any fetch already in flight for this box is cancelled first.
+            The response is parsed and displayed by on_fetch_done() once it arrives.
+
+            Fetch and parse go through the shared DocumentCache, so boxes on the same URL share both.
+            With targeted, as on unattended refreshes, only what the current filter can match is parsed;
+            the rest of the page is parsed if the filter is later changed.
+
+            In crawl mode, a crawl from the URL is started instead, see start_crawl().
+        """
+
+        if not bool(URL_RE.match(self.url)):
             self.set_status("The provided URL is invalid. It must starts with [ http(s):// ].")
             return
 
+        if self.is_crawl:
+            self.start_crawl()
+            return
+
+        self.cancel_fetch()
+        self.fetch_seq += 1
+        seq = self.fetch_seq
+
         try:
-            from aio import async_fetch
-            # resp = requests.get(self.input_url.text())
-            resp = async_fetch(self.input_url.text()).result()
+            self.fetch_url = self.url
+            self.fetch_parser = self.parser
+            target = (self.filter_text, self.filter_option) if targeted and self.filter_text else None
+            self.fetch_future = get_document_cache().get(self.fetch_url, progress=partial(self._emit_fetch_progress, seq),
+                                                         target=target, parser=self.fetch_parser)
         except BaseException as e:
+            self.fetch_future = None
             self.set_status(repr(e))
             return
 
-        if resp.status_code == 200:
-            self.enable_transform(False)
-            self.status_code = resp.status_code
+        self.fetch_from_cache = self.fetch_future.done()
+        self.fetch_future.add_done_callback(partial(self._emit_fetch_done, seq))
+        self.fetch_timer.start(FETCH_TIMEOUT_MS)
+        self.fetch_progress_text = None
+        self.update_fetch_button()
 
-            # Parse response
-            self.resp_raw = resp.text
-            self.resp_soup = BeautifulSoup(self.resp_raw, 'lxml')
-            self.resp_html_full = self.resp_soup.prettify()
+    @property
+    def is_fetching(self) -> bool:
+        return self.fetch_future is not None or self.crawler is not None
+
+    def on_fetch_clicked(self, _=None):
+        # The button reads Stop while a fetch or crawl is in flight
+        if self.is_fetching:
+            self.stop_fetch()
+        else:
+            self.requests_get()
+
+    def _emit_fetch_progress(self, seq, nbytes, total):
+        # Runs on the worker thread, as _emit_fetch_done() does
+        try:
+            self.fetch_progress.emit(seq, nbytes, total)
+        except RuntimeError:
+            pass
+
+    def on_fetch_progress(self, seq, nbytes, total):
+        if seq != self.fetch_seq or self.fetch_future is None:
+            return
+        progress = format_size(nbytes) if total is None else f"{format_size(nbytes)} / {format_size(total)}"
+        self.fetch_progress_text = progress
+        self.update_fetch_button()
+        self.parent.set_status(f"Downloading {self.fetch_url}: {progress}")
+
+    def _emit_fetch_done(self, seq, future):
+        # Runs on the worker thread; the box may already be deleted by the time the fetch completes.
+        try:
+            self.fetch_done.emit(seq, future)
+        except RuntimeError:
+            pass
+
+    def on_fetch_done(self, seq, future):
+        """
+            Slot for fetch_done, runs on the GUI thread. Results of cancelled or superseded fetches are dropped.
+        """
+        if seq != self.fetch_seq or future.cancelled():
+            return
+
+        self.fetch_timer.stop()
+        self.fetch_future = None
+        self.reset_fetch_button()
+
+        try:
+            page = future.result()
+        except BaseException as e:
+            self.set_status(repr(e))
+            self.parent.on_box_fetched(self, error=e)
+            return
+
+        resp = page.result
+        self.record_fetch_metrics(page)
+        if page.doc is not None and page.doc is self.resp_doc:
+            # Nothing changed since the last fetch (a 304, or the same body), keep the current soup and display as is
+            self.set_status("URL not modified since last fetch." if resp.not_modified else "URL content unchanged since last fetch.")
+            self.parent.record_history(self, self.last_output)
+
+        elif page.doc is not None:
+            # A transform written for another page is unlikely to apply, a refresh of the same page keeps it
+            if self.resp_url is not None and self.resp_url != page.url:
+                self.enable_transform(False)
+            if self.resp_doc is not None:
+                get_document_cache().release(self.resp_url, self.resp_doc.parser)
+            get_document_cache().acquire(page.url, page.doc.parser)
+            self.status_code = 200
+            self.resp_url = page.url
+
+            # Parsed by the DocumentCache, possibly shared with other boxes on the same URL
+            self.resp_doc = page.doc
 
             # Post process
-            self.btn_fetch.setText("Re-fetch")
-            self.input_filter.setEnabled(True)
+            self.update_fetch_button()
+            if self.body is not None:
+                self.input_filter.setEnabled(True)
+            self.history_pending = True
             self.send_to_display()
-            self.set_status("URL Fetch succeeded.")
+            self.set_status(f"URL Fetch succeeded. {self.resp_doc.summary()}.")
+            self.parent.release_idle_memory(self)
 
         else:
             self.set_status(repr(resp))
 
+        self.parent.on_box_fetched(self, resp)
+
+    def record_fetch_metrics(self, page):
+        if self.fetch_from_cache:
+            return
+        self.metrics.record(metrics.STAGE_NETWORK, page.result.elapsed, page.result.nbytes)
+        doc = page.doc
+        if doc is not None and doc is not self.resp_doc and doc.parse_time:
+            self.metrics.record(metrics.STAGE_PARSE, doc.parse_time, page.result.nbytes, doc.node_count)
+
+    def cancel_fetch(self):
+        """
+            Drop the in-flight fetch, if any. The transfer is stopped unless other boxes are waiting on it too,
+            and its result, if it still arrives, is ignored by this one. A crawl is stopped, keeping the pages
+            it already went through on display.
+        """
+        if self.crawler is not None:
+            # Superseded first, stop() may report the crawl over right away
+            crawler, self.crawler = self.crawler, None
+            self.crawl_seq += 1
+            crawler.stop()
+            self.show_crawl_result()
+            self.reset_fetch_button()
+
+        if self.fetch_future is None:
+            return
+
+        get_document_cache().abandon(self.fetch_url, self.fetch_future, self.fetch_parser)
+        self.fetch_future = None
+        self.fetch_seq += 1
+        self.fetch_timer.stop()
+        self.reset_fetch_button()
+
+    def stop_fetch(self):
+        self.cancel_fetch()
+        self.set_status("Crawl stopped." if self.is_crawl else "URL Fetch stopped.")
+        self.parent.on_box_fetched(self, error=FetchCancelled(self.fetch_url))
+
+    def fetch_timeout(self):
+        self.cancel_fetch()
+        self.set_status(f"URL Fetch timed out after {FETCH_TIMEOUT_MS // 1000}s.")
+        self.parent.on_box_fetched(self, error=TimeoutError())
+
+    def reset_fetch_button(self):
+        self.fetch_progress_text = None
+        self.update_fetch_button()
+
+    def update_fetch_button(self):
+        # The button reads Stop while a fetch is in flight
+        if self.body is None:
+            return
+        if self.fetch_future is not None:
+            self.btn_fetch.setText("Stop" if self.fetch_progress_text is None else f"Stop ({self.fetch_progress_text})")
+        elif self.crawler is not None:
+            self.btn_fetch.setText(f"Stop ({self.crawler.pages} pages)")
+        elif self.is_crawl:
+            self.btn_fetch.setText("Crawl")
+        else:
+            self.btn_fetch.setText("Re-fetch" if self.status_code == 200 else "Fetch")
+
     def requests_extract(self, _=None):
         """
             Extract data only after self.requests_get() is called.
@@ -208,91 +620,291 @@ class EntityBox(qt.QWidget):
             Note that CSS option used RegEx, therefore any filter with non-alphanumeric character must be escaped.
 
             e.g. ``List(n)`` must be entered as ``List\(n\)``.
+
+            Selector option takes a real CSS selector instead, e.g. ``div.list > a[href]``, no escaping needed.
+            It shows at most engine.SELECT_LIMIT matches.
         """
         if self.status_code != 200:
             return
 
-        if not len(self.input_filter.text()):
-            self.resp_html = self.resp_html_full
-            return
-
         try:
-            if self.is_with_css:
-                repo_html = []
-                for tag in list(self.resp_soup.find_all(class_=re.compile(self.input_filter.text()))):
-                    if tag.name not in EntityBox.TAG_EXCLUDE:
-                        if str(tag) not in repo_html:
-                            repo_html.append(str(tag))
-                resp_html_sub = '<br>\n'.join(repo_html)
-
-            else:
-                repo_html = []
-                for tag in list(self.resp_soup.find_all()):
-                    if (tag.name not in EntityBox.TAG_EXCLUDE) and (self.input_filter.text() in tag.text):
-                        if str(tag) not in repo_html:
-                            repo_html.append(str(tag))
-                resp_html_sub = '<br>\n'.join(repo_html)
-
+            start = time.perf_counter()
+            self.resp_result = self.resp_doc.result(self.filter_text, self.filter_option, self.collapse_nested)
+            self.metrics.record(metrics.STAGE_EXTRACT, time.perf_counter() - start, nodes=len(self.resp_result.tags))
+            if self.filter_option == engine.FILTER_SELECTOR and len(self.resp_result.tags) >= engine.SELECT_LIMIT:
+                self.set_status(f"Showing the first {engine.SELECT_LIMIT} selector matches.")
         except BaseException as e:
-            resp_html_sub = repr(e)
+            self.resp_result = engine.Result.from_error(e)
 
-        self.resp_html = resp_html_sub
+    @property
+    def resp_html(self) -> str:
+        return self.resp_result.html if self.resp_result is not None else None
+
+    def schedule_filter(self, _=None):
+        """
+            Debounce filter edits: a pending evaluation is superseded by each new keystroke,
+            so only the filter the user settles on is evaluated.
+        """
+        self.filter_timer.start(FILTER_DEBOUNCE_MS)
 
     def send_to_display(self):
+        self.filter_timer.stop()
+        if self.is_crawl:
+            # Crawled pages are not kept, only their matches: these are shown again, e.g. with a new transform,
+            # but a new filter takes a new crawl
+            if self.crawl_matches is not None and self.crawler is None:
+                if self.crawl_filter != (self.filter_text, self.filter_option, self.collapse_nested):
+                    self.set_status("Crawl again to apply the filter to every page.")
+                self.display.refresh()
+            return
         if self.status_code != 200:
             return
 
         self.requests_extract()
-        self.display.set_text(self.resp_html)
+        self.display.set_result(self.resp_result, self.resp_doc)
+        self.update_memory_readout()
+
+    def start_crawl(self):
+        """
+            Crawl from the URL in the background, following the links matching crawl_links up to crawl_depth hops
+            and crawl_pages pages, crawl_delay seconds apart. Matches of the filter on every page are shown as one,
+            as the pages land.
+        """
+        self.cancel_fetch()
+        self.release_page()
+        self.status_code = -1
+        self.crawl_seq += 1
+        seq = self.crawl_seq
+
+        self.crawl_matches = crawl.CrawlMatches()
+        self.crawl_filter = (self.filter_text, self.filter_option, self.collapse_nested)
+        self.crawler = crawl.Crawler(self.url, self.filter_text, self.filter_option, self.crawl_links,
+                                     self.collapse_nested, self.crawl_depth, self.crawl_pages, self.parser,
+                                     on_page=partial(self._emit_crawl_page, seq), on_done=partial(self._emit_crawl_done, seq),
+                                     host_delay=self.crawl_delay)
+        self.crawler.start()
+        self.update_fetch_button()
+
+    def _emit_crawl_page(self, seq, page):
+        # Runs on a fetch worker thread, as _emit_fetch_done() does
+        try:
+            self.crawl_page.emit(seq, page)
+        except RuntimeError:
+            pass
+
+    def _emit_crawl_done(self, seq, crawler):
+        try:
+            self.crawl_done.emit(seq, crawler)
+        except RuntimeError:
+            pass
+
+    def on_crawl_page(self, seq, page):
+        if seq != self.crawl_seq or self.crawler is None:
+            return
+        self.crawl_matches.add(page)
+        if page.result is not None:
+            self.metrics.record(metrics.STAGE_NETWORK, page.result.elapsed, page.result.nbytes)
+        if page.parse_time:
+            self.metrics.record(metrics.STAGE_PARSE, page.parse_time, page.result.nbytes, page.nodes)
+
+        # Redrawn at most every CRAWL_DISPLAY_MS, not once per page
+        if not self.crawl_timer.isActive():
+            self.crawl_timer.start(CRAWL_DISPLAY_MS)
+        self.update_fetch_button()
+        self.parent.set_status(f"{self.crawler.summary()}, {self.crawl_matches.count()} matches")
+
+    def on_crawl_done(self, seq, crawler):
+        if seq != self.crawl_seq:
+            return
+        self.crawler = None
+        self.history_pending = True
+        self.show_crawl_result()
+        self.update_fetch_button()
+        self.set_status(f"{crawler.summary()}, {self.crawl_matches.count()} matches")
+        self.parent.on_box_fetched(self, crawler.start_result, crawler.start_error)
+
+    def show_crawl_result(self):
+        self.crawl_timer.stop()
+        if self.crawl_matches is None:
+            return
+        self.resp_result = self.crawl_matches.result()
+        self.display.set_result(self.resp_result)
+
+    def set_crawl(self, checked):
+        self.is_crawl = bool(checked)
+        self.cancel_fetch()
+        self.update_fetch_button()
+        if self.body is not None:
+            self.input_filter.setEnabled(self.status_code == 200 or self.is_crawl)
+
+    def on_crawl_links_edited(self, text):
+        self.crawl_links = text
+
+    def set_crawl_depth(self, depth):
+        self.crawl_depth = depth
+
+    def set_crawl_pages(self, pages):
+        self.crawl_pages = pages
+
+    def set_crawl_delay(self, delay):
+        self.crawl_delay = delay
+
+    def on_output_ready(self, text):
+        self.last_output = text
+        if self.history_pending:
+            self.history_pending = False
+            self.parent.record_history(self, text)
+
+    def release_page(self):
+        """
+            Let go of the shared page, e.g. when the box is removed.
+        """
+        if self.resp_doc is not None:
+            get_document_cache().release(self.resp_url, self.resp_doc.parser)
+            self.resp_doc = None
+            self.resp_result = None
+            self.display.set_result(None)
+
+    def release_memory(self):
+        """
+            Drop the parsed page, keeping it compressed. It is parsed again when next queried.
+        """
+        if self.resp_doc is not None and not self.resp_doc.is_released:
+            self.resp_doc.release()
+            self.update_memory_readout()
+
+    def update_memory_readout(self):
+        if self.body is None:
+            return
+        if self.resp_doc is None:
+            self.lbl_memory.setText("")
+            return
+
+        size = format_size(self.resp_doc.memory())
+        state = " (released)" if self.resp_doc.is_released else ""
+        self.lbl_memory.setText(f"~{size}{state}")
 
     def output_html(self, _=None):
-        self.display.output_option = 0
-        self.send_to_display()
+        self.display.set_output_option(0)
 
     def output_clean(self, _=None):
-        self.display.output_option = 1
-        self.send_to_display()
+        self.display.set_output_option(1)
 
     def output_raw(self, _=None):
-        self.display.output_option = 2
-        self.send_to_display()
+        self.display.set_output_option(2)
 
     def with_css(self, _=None):
-        self.is_with_css = True
+        self.filter_option = engine.FILTER_CSS
         self.send_to_display()
 
     def with_text(self, _=None):
-        self.is_with_css = False
+        self.filter_option = engine.FILTER_TEXT
+        self.send_to_display()
+
+    def with_selector(self, _=None):
+        self.filter_option = engine.FILTER_SELECTOR
+        self.send_to_display()
+
+    def with_outermost(self, checked):
+        self.collapse_nested = bool(checked)
         self.send_to_display()
 
     def set_status(self, msg):
         self.parent.set_status(msg)
 
+    def set_refresh_interval(self, minutes):
+        self.refresh_interval = minutes * 60
+        self.parent.on_refresh_interval_changed(self)
+
+    def set_parser(self, index):
+        """
+            Switch parser backend. A fetched page is parsed again, without a request if it is still fresh.
+        """
+        self.parser = engine.PARSERS[index]
+        if self.resp_doc is not None and self.resp_doc.parser != self.parser:
+            self.requests_get()
+
+    def calibrate(self, _=None):
+        """
+            Time every parser backend on the fetched page with the current filter, in the background;
+            on_calibrated() then switches to the fastest one whose output is the same.
+        """
+        if self.resp_doc is None:
+            self.set_status("Fetch a page before calibrating the parser.")
+            return
+
+        args = (self.resp_doc.text, self.filter_text, self.filter_option, self.resp_doc.content_type,
+                self.collapse_nested)
+        self.is_calibrating = True
+        self.update_calibrate_button()
+        self.set_status("Calibrating parsers...")
+        threading.Thread(target=self._run_calibration, args=args, daemon=True).start()
+
+    def _run_calibration(self, *args):
+        # Runs on the calibration thread
+        try:
+            timings = parsers.calibrate(*args)
+        except BaseException as e:
+            timings = e
+        try:
+            self.calibrate_done.emit(timings)
+        except RuntimeError:
+            pass
+
+    def on_calibrated(self, timings):
+        self.is_calibrating = False
+        if isinstance(timings, BaseException):
+            self.update_calibrate_button()
+            self.set_status(f"Calibration failed: {timings!r}")
+            return
+
+        # Also kept on the button, the status bar is soon taken over by the fetch of the new parser
+        parser = parsers.recommend(timings)
+        self.calibration = timings
+        self.set_status(f"Using {parser}. " + "; ".join(map(repr, timings)))
+        self.set_parser(engine.PARSERS.index(parser))
+        self.update_calibrate_button()
+
+    def update_calibrate_button(self):
+        if self.body is None:
+            return
+        self.btn_calibrate.setEnabled(not self.is_calibrating)
+        if self.calibration is None:
+            self.btn_calibrate.setToolTip("Time every parser on the fetched page and use the fastest giving the same output")
+        else:
+            self.btn_calibrate.setToolTip(f"Last calibration, using {parsers.recommend(self.calibration)}:\n"
+                                          + "\n".join(map(repr, self.calibration)))
+        self.cmb_parser.blockSignals(True)
+        self.cmb_parser.setCurrentIndex(engine.PARSERS.index(self.parser))
+        self.cmb_parser.blockSignals(False)
+
     def enable_transform(self, enable):
-        if enable:
-            self.is_with_transform = True
-            self.form.setRowVisible(4, True)
-            self.input_transform.textChanged.connect(self.get_from_input_and_set_transform)
+        self.is_with_transform = bool(enable)
+        if self.body is not None:
+            self.btn_transform.setChecked(self.is_with_transform)
+            self.form.setRowVisible(self.input_transform, self.is_with_transform)
+            self.form.setRowVisible(self.cmb_transform_input, self.is_with_transform)
 
+        if enable:
             self.get_from_input_and_set_transform()
             self.set_status('Transform enabled.')
 
         else:
-            self.is_with_transform = False
-            self.form.setRowVisible(4, False)
-            if self.input_transform.receivers(self.input_transform.textChanged) > 0:
-                self.input_transform.textChanged.disconnect()
-
             self.unset_display_transform()
             self.set_status('Transform disabled.')
 
+    def set_transform_input(self, input_option):
+        self.transform_input = input_option
+        if self.is_with_transform:
+            self.get_from_input_and_set_transform()
+
     def unset_display_transform(self):
         self.func_transform = None
         self.display.set_transform(None)
 
     def set_display_transform(self):
         self.set_status('Transform set and ready.')
-        self.display.set_transform(self.func_transform)
+        self.display.set_transform(self.transform_text, self.transform_input)
 
     def get_from_input_and_set_transform(self):
         """
@@ -303,13 +915,16 @@ class EntityBox(qt.QWidget):
         Suggest to be paired with HTML display mode given WYSIWYG, otherwise for non-HTML data,
         some tags maybe added to the raw data given the soup conversion.
 
+        The Input option picks what x is: the displayed Text, the response Bytes, the parsed JSON,
+        the extracted Tags as dicts, or a DataFrame of either the JSON or the tags.
+
         Example
         ----------------------------------
         url=https://data.weather.gov.hk/weatherAPI/opendata/weather.php?dataType=fnd&lang=en
 
         .. code-block:: python
-        def f(x):
-            tmp = pd.DataFrame(json.loads(x)['weatherForecast']).set_index('forecastDate')
+        def f(x):  # Input: JSON
+            tmp = pd.DataFrame(x['weatherForecast']).set_index('forecastDate')
             cols = ['forecastMaxtemp', 'forecastMintemp', 'forecastMaxrh', 'forecastMinrh']
 
             for col in cols:
@@ -320,78 +935,211 @@ class EntityBox(qt.QWidget):
         """
 
         # TODO: Add transformation as charts, also add ability to dynamically import
-        err_msg = 'Transformation must be a Python function starting with ' \
-                  'def f(x): and returns a value, input is malformed'
         # x: str = self.display.label.document().toPlainText()
-        fn: str = self.input_transform.document().toPlainText()
+        fn: str = self.transform_text
 
         try:
-            fn = fn.strip()
-            if not fn.startswith('def') or 'return' not in fn:
-                self.set_status(err_msg)
-
-            # Extract parameters from function, mangle function name and call from local
-            # fn_sig_ori = fn[fn.index(" ")+1:fn.index("(")]
-            fn_sig_new = f'_F{id(self)}'
-            fn_args = fn[fn.index("(")+1:fn.index(")")]
-            fn_body = fn[fn.index('\n')+1:]
-            fn_reconstructed = f"def {fn_sig_new}({fn_args}):\n{fn_body}"
-            exec(fn_reconstructed)
-
-            self.func_transform = locals()[fn_sig_new]
+            # Checked here only to report malformed input early, without the pandas namespace of
+            # compile_transform(): transforms run in the TransformRunner workers
+            self.func_transform = engine.check_transform(fn, f'_F{id(self)}')
             self.set_display_transform()
             self.send_to_display()
 
         except Exception as e:
-            self.set_status(err_msg)
+            self.set_status(engine.TRANSFORM_ERR_MSG)
             self.func_transform = lambda x: x
 
     def to_config(self) -> dict:
         cfg = dict(
-            url=self.input_url.text(),
-            filter=self.input_filter.text(),
-            is_with_css=self.is_with_css,
+            url=self.url,
+            filter=self.filter_text,
+            is_with_css=self.filter_option == engine.FILTER_CSS,
+            filter_option=self.filter_option,
+            collapse_nested=self.collapse_nested,
             output_option=self.display.output_option,
+            display_cap=self.display.max_chars,
+            refresh_interval=self.refresh_interval,
             is_with_transform=self.is_with_transform,
-            transform=self.input_transform.document().toPlainText() if self.func_transform is not None else ""
+            transform_input=self.transform_input,
+            parser=self.parser,
+            crawl=self.is_crawl,
+            crawl_links=self.crawl_links,
+            crawl_depth=self.crawl_depth,
+            crawl_pages=self.crawl_pages,
+            crawl_delay=self.crawl_delay,
+            transform=self.transform_text if self.func_transform is not None else ""
         )
         return cfg
 
-    def from_config(self, cfg: dict):
-        self.input_url.setText(cfg.get('url', ''))
-        self.input_filter.setText(cfg.get('filter', ''))
-        self.is_with_css = cfg.get('is_with_css', True)
+    def from_config(self, cfg: dict, fetch: bool = True):
+        """
+            Apply a saved config, then fetch its URL unless fetch is False, in which case the caller fetches later.
+        """
+        self.url = cfg.get('url', '')
+        self.filter_text = cfg.get('filter', '')
+        self.filter_option = engine.filter_option_from_config(cfg)
+        self.collapse_nested = cfg.get('collapse_nested', False)
         self.display.output_option = cfg.get('output_option', 0)
+        self.display.max_chars = cfg.get('display_cap', DISPLAY_MAX_CHARS)
+        self.refresh_interval = cfg.get('refresh_interval', REFRESH_INTERVAL)
+        self.parent.on_refresh_interval_changed(self)
         self.is_with_transform = cfg.get('is_with_transform', False)
-        self.input_transform.setPlainText(cfg.get('transform', ''))
+        self.transform_text = cfg.get('transform', '')
+        self.transform_input = cfg.get('transform_input', engine.INPUT_TEXT)
+        self.parser = cfg.get('parser', engine.PARSER_LXML)
+        self.is_crawl = cfg.get('crawl', False)
+        self.crawl_links = cfg.get('crawl_links', '')
+        self.crawl_depth = cfg.get('crawl_depth', crawl.CRAWL_MAX_DEPTH)
+        self.crawl_pages = cfg.get('crawl_pages', crawl.CRAWL_MAX_PAGES)
+        self.crawl_delay = cfg.get('crawl_delay', crawl.CRAWL_HOST_DELAY)
+        self.fill_body()
+
+        if fetch:
+            self.requests_get()
+        if self.is_with_transform:
+            self.enable_transform(True)
 
-        if self.is_with_css:
-            self.rdo_with_css.setChecked(True)
-        else:
-            self.rdo_with_text.setChecked(True)
 
-        if self.display.output_option == 0:
-            self.rdo_html.setChecked(True)
-        elif self.display.output_option == 1:
-            self.rdo_clean.setChecked(True)
-        elif self.display.output_option == 2:
-            self.rdo_raw.setChecked(True)
+class DisplayModel(QObject):
+    """
+        What a box displays: the Result and display options, and the final text after any transform.
+        Kept apart from the ScrollDisplay widget, so a box without one, e.g. scrolled out of view,
+        still refreshes, transforms and records its output.
 
-        self.requests_get()
-        if self.is_with_transform:
-            self.btn_transform.setChecked(True)
-            self.enable_transform(True)
+        A transform, if set, runs in the shared TransformRunner worker processes; the display shows
+        a placeholder until its output arrives through transform_done.
+    """
+    # Emitted from a TransformRunner thread with (transform sequence number, output)
+    transform_done = pyqtSignal(int, str)
+    # Emitted with the final text once it is known, i.e. the output of the transform if there is one
+    output_ready = pyqtSignal(str)
+    # Emitted when the text to show changes
+    changed = pyqtSignal()
+
+    def __init__(self, parent: QObject = None, stage_metrics: metrics.StageMetrics = None):
+        super().__init__(parent)
+        self.metrics = stage_metrics if stage_metrics is not None else metrics.StageMetrics()
+        self.output_option = 0
+        self.transform_src = None
+        self.transform_input = engine.INPUT_TEXT
+        self.transform_job = None
+        self.transform_seq = 0
+        self.transform_started = None
+        self.max_chars = DISPLAY_MAX_CHARS
+        self.result: engine.Result = None
+        self.doc: engine.Document = None
+        self.text: str = None  # Text to show, None until the first result and once the result is dropped
+        self.is_html = False
+
+        self.transform_done.connect(self.on_transform_done)
+
+    def set_transform(self, fn_src: str = None, input_option: int = engine.INPUT_TEXT):
+        self.cancel_transform()
+        self.transform_src = fn_src
+        self.transform_input = input_option
+
+    def cancel_transform(self):
+        if self.transform_job is not None:
+            self.transform_job.cancel()
+            self.transform_job = None
+        self.transform_seq += 1
+
+    def set_result(self, result: engine.Result, doc: engine.Document = None):
+        """
+            Show result, or with None, nothing: the text and any transform still running on the last result are dropped.
+        """
+        self.result = result
+        self.doc = doc
+        if result is None:
+            self.cancel_transform()
+            self.show(None, False)
+            return
+        self.refresh()
+
+    def set_output_option(self, output_option: int):
+        # Views are cached on the Result, switching option is a lookup plus a re-layout
+        self.output_option = output_option
+        self.refresh()
+
+    def refresh(self):
+        if self.result is None:
+            return
+
+        start = time.perf_counter()
+        text = self.result.view(self.output_option)
+        self.metrics.record(metrics.STAGE_VIEW, time.perf_counter() - start, len(text))
+        # Option = HTML, Clean / Raw are shown as plain text
+        is_html = self.output_option == 0 and Qt.mightBeRichText(text)
+
+        # With Transform, fed the text of the whole output as headless.py does, not what is laid out,
+        # or with another input option, data taken from the document without going through the display
+        if self.transform_src is not None:
+            self.cancel_transform()
+            seq = self.transform_seq
+            try:
+                x = engine.transform_payload(self.doc, self.result, self.transform_input, self.output_option)
+            except BaseException as e:
+                self.show(repr(e), False)
+                self.output_ready.emit(repr(e))
+                return
+            self.transform_started = time.perf_counter()
+            self.transform_job = get_runner().submit(self.transform_src, x, partial(self._emit_transform_done, seq),
+                                                     self.transform_input)
+            if not self.transform_job.done:
+                self.show("Transforming...", False)
+            return
+
+        self.show(text, is_html)
+        self.output_ready.emit(text)
+
+    def _emit_transform_done(self, seq, output):
+        # May run on a TransformRunner thread, after the model is deleted
+        try:
+            self.transform_done.emit(seq, output)
+        except RuntimeError:
+            pass
+
+    def on_transform_done(self, seq, output):
+        if seq != self.transform_seq:
+            return
+        self.transform_job = None
+        self.metrics.record(metrics.STAGE_TRANSFORM, time.perf_counter() - self.transform_started, len(output))
+        self.show(output, False)
+        self.output_ready.emit(output)
+
+    def html_pieces(self, max_chars: int) -> list:
+        # The HTML text is always the HTML view of the result
+        return self.result.html_pieces(max_chars) if self.result is not None else [self.text]
+
+    def show(self, text: str, is_html: bool):
+        self.text = text
+        self.is_html = is_html
+        self.changed.emit()
 
 
 class ScrollDisplay(qt.QScrollArea):
     """
-        Scrollable Website Content Display.
+        Scrollable Website Content Display, a view of a DisplayModel.
+
+        The text to show is kept as a list of pieces, and only laid out chunk by chunk:
+        the first chunk when the model changes, the next ones as the view is scrolled near its bottom.
+        Past max_chars, a [Show more] button has to be pressed to lay out more, so display cost is bounded
+        whatever the size of the page. Text is split between lines, HTML between whole elements as the Result
+        cuts it (matches, or the elements of the page body), so a chunk never ends inside an element;
+        an element bigger than a chunk is laid out in one go.
     """
     # constructor
-    def __init__(self):
+    def __init__(self, model: DisplayModel):
         super().__init__()
-        self.output_option = 0
-        self.func_transform = None
+        self.model = model
+
+        # display model
+        self.pieces: list[str] = []
+        self.is_html = False
+        self.rendered = 0  # pieces laid out so far
+        self.rendered_chars = 0
+        self.cap = model.max_chars
+        self.is_rendering = False  # Editing the document moves the scroll bar, on_scroll must not re-enter
 
         # making widget resizable
         self.setWidgetResizable(True)
@@ -404,40 +1152,287 @@ class ScrollDisplay(qt.QScrollArea):
         self.label.setAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop)
         self.label.setSizePolicy(qt.QSizePolicy.Policy.Expanding, qt.QSizePolicy.Policy.Expanding)
 
-        self.setWidget(self.label)
+        self.btn_more = qt.QPushButton("Show more")
+        self.btn_more.setVisible(False)
+
+        container = qt.QWidget()
+        layout = qt.QVBoxLayout()
+        layout.setContentsMargins(CONTENT_MARGINS_NARROW)
+        layout.setSpacing(0)
+        layout.addWidget(self.label)
+        layout.addWidget(self.btn_more)
+        container.setLayout(layout)
+        self.setWidget(container)
+
+        self.label.verticalScrollBar().valueChanged.connect(self.on_scroll)
+        self.btn_more.clicked.connect(self.show_more)
+        model.changed.connect(self.on_model_changed)
+        self.on_model_changed()
+
+    def on_model_changed(self):
+        if self.model.text is not None:
+            self.set_model(self.model.text, self.model.is_html)
+        else:
+            self.clear()
+
+    def clear(self):
+        self.pieces = []
+        self.rendered = 0
+        self.rendered_chars = 0
+        self.is_rendering = True
+        self.label.clear()
+        self.is_rendering = False
+        self.btn_more.setVisible(False)
+
+    def set_model(self, text: str, is_html: bool):
+        """
+            Replace the displayed text and lay out its first chunk.
+        """
+        start = time.perf_counter()
+        self.cap = self.model.max_chars
+        if is_html:
+            # Whole elements only: insertHtml() of part of an element would close it and open another
+            self.pieces = self.model.html_pieces(DISPLAY_CHUNK_CHARS) if len(text) > DISPLAY_CHUNK_CHARS else [text]
+        else:
+            self.pieces = text.splitlines(keepends=True)
 
-    def set_transform(self, func=None):
-        self.func_transform = func
+        self.is_html = is_html
+        self.rendered = 0
+        self.rendered_chars = 0
 
-    def set_text(self, html):
-        # Option = HTML
-        if self.output_option == 0:
-            self.label.setText(html)
+        self.is_rendering = True
+        self.label.clear()
+        self.is_rendering = False
+        self.render_chunk()
+        self.model.metrics.record(metrics.STAGE_LAYOUT, time.perf_counter() - start, self.rendered_chars)
 
-        # Option = Clean
-        elif self.output_option == 1:
-            plain_soup = BeautifulSoup(html, 'lxml')
-            body = re.sub('[\n| ]+', '\n', plain_soup.text)
-            self.label.setPlainText(body)
+    def render_chunk(self):
+        """
+            Lay out the next DISPLAY_CHUNK_CHARS worth of pieces, at least one, without going past the cap.
+        """
+        start = self.rendered
+        size = 0
+        while self.rendered < len(self.pieces) and size < DISPLAY_CHUNK_CHARS and self.rendered_chars + size < self.cap:
+            size += len(self.pieces[self.rendered])
+            self.rendered += 1
+
+        if self.rendered > start:
+            self.is_rendering = True
+            chunk = ''.join(self.pieces[start:self.rendered])
+            cursor = self.label.textCursor()
+            cursor.movePosition(QtGui.QTextCursor.MoveOperation.End)
+            if self.is_html:
+                cursor.insertHtml(chunk)
+            else:
+                cursor.insertText(chunk)
+            self.rendered_chars += size
 
-        # Option = Raw
-        elif self.output_option == 2:
-            self.label.setPlainText(html)
+            # Keep the view at the top on the first chunk
+            if start == 0:
+                self.label.moveCursor(QtGui.QTextCursor.MoveOperation.Start)
+            self.is_rendering = False
 
-        # With Transform
-        if self.func_transform is not None:
-            try:
-                text = self.func_transform(self.label.document().toPlainText())
-                self.label.setPlainText(text)
-            except BaseException as e:
-                self.label.setPlainText(repr(e))
+        remaining = len(self.pieces) - self.rendered
+        self.btn_more.setVisible(bool(remaining) and self.rendered_chars >= self.cap)
+        self.btn_more.setText(f"Show more ({remaining} more {'elements' if self.is_html else 'lines'})")
+
+    def on_scroll(self, value):
+        # Lay out the next chunk once the view gets within a page of the bottom
+        if self.is_rendering:
+            return
+        bar = self.label.verticalScrollBar()
+        if value >= bar.maximum() - bar.pageStep() and self.rendered < len(self.pieces) and self.rendered_chars < self.cap:
+            self.render_chunk()
+
+    def show_more(self, _=None):
+        self.cap += self.model.max_chars
+        self.render_chunk()
+
+
+class RefreshQueueDialog(qt.QDialog):
+    '''
+        Live view of the refresh scheduler: every widget, when it refreshes next and how the last refresh went.
+    '''
+    COLUMNS = ("URL", "Every", "Next run", "Failures", "Last status")
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.parent = parent
+        self.setWindowTitle("Refresh Queue")
+        self.resize(QSize(720, 360))
+
+        self.table = qt.QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setEditTriggers(qt.QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(0, qt.QHeaderView.ResizeMode.Stretch)
+        self.table.verticalHeader().setVisible(False)
+
+        layout = qt.QVBoxLayout()
+        layout.setContentsMargins(CONTENT_MARGINS_NORMAL)
+        layout.addWidget(self.table)
+        self.setLayout(layout)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.update_queue)
+
+    def showEvent(self, e):
+        self.update_queue()
+        self.timer.start(QUEUE_VIEW_REFRESH_MS)
+        super().showEvent(e)
+
+    def hideEvent(self, e):
+        self.timer.stop()
+        super().hideEvent(e)
+
+    def update_queue(self):
+        scheduler = self.parent.scheduler
+        is_on = self.parent.chk_auto_refresh.isChecked()
+        entries = scheduler.queue()
+        now = scheduler.clock()
+
+        self.table.setRowCount(len(entries))
+        for row, entry in enumerate(entries):
+            if entry.running:
+                next_run = "running"
+            elif not is_on:
+                next_run = "paused"
+            else:
+                next_run = f"in {max(entry.next_run - now, 0):.0f}s"
+            cells = (entry.source.url, f"{entry.interval // 60} min" if entry.interval >= 60 else f"{entry.interval}s", next_run,
+                     str(entry.failures), entry.last_status)
+            for col, cell in enumerate(cells):
+                self.table.setItem(row, col, qt.QTableWidgetItem(cell))
+
+
+class DiagnosticsDialog(qt.QDialog):
+    '''
+        Live per-stage timings, from network to Qt layout: rolling p50 / p95 over every widget, then per widget.
+        Also turns on profiling of the next Fetch All.
+    '''
+    COLUMNS = ("Widget", "Stage", "Runs", "Last", "p50", "p95", "Size", "Nodes")
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.parent = parent
+        self.setWindowTitle("Diagnostics")
+        self.resize(QSize(760, 420))
+
+        self.table = qt.QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setEditTriggers(qt.QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(0, qt.QHeaderView.ResizeMode.Stretch)
+        self.table.verticalHeader().setVisible(False)
+
+        self.chk_profile = qt.QCheckBox("Profile next Fetch All")
+        self.chk_profile.setToolTip("Run the next Fetch All under cProfile and write the stats to a .prof file")
+        self.chk_profile.setChecked(parent.profile_fetch_all)
+        self.btn_clear = qt.QPushButton("Clear")
+
+        layout_btn = qt.QHBoxLayout()
+        layout_btn.addWidget(self.chk_profile)
+        layout_btn.addStretch(1)
+        layout_btn.addWidget(self.btn_clear)
+
+        layout = qt.QVBoxLayout()
+        layout.setContentsMargins(CONTENT_MARGINS_NORMAL)
+        layout.addWidget(self.table)
+        layout.addLayout(layout_btn)
+        self.setLayout(layout)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.update_metrics)
+        self.chk_profile.clicked.connect(self.set_profile)
+        self.btn_clear.clicked.connect(self.clear)
+
+    def showEvent(self, e):
+        self.update_metrics()
+        self.timer.start(QUEUE_VIEW_REFRESH_MS)
+        super().showEvent(e)
+
+    def hideEvent(self, e):
+        self.timer.stop()
+        super().hideEvent(e)
+
+    def set_profile(self, checked):
+        self.parent.profile_fetch_all = bool(checked)
+
+    def clear(self, _=None):
+        for eb in self.parent.list_entity_box:
+            eb.metrics.clear()
+        self.update_metrics()
+
+    def update_metrics(self):
+        self.chk_profile.setChecked(self.parent.profile_fetch_all)
+        boxes = self.parent.list_entity_box
+
+        # Every widget pooled, then each widget on its own
+        pooled = metrics.StageMetrics(window=None)
+        for eb in boxes:
+            for stage, samples in eb.metrics.samples.items():
+                pooled.samples[stage].extend(samples)
+        # The last run of a pooled stage is just that of whichever widget came last, left out
+        rows = [("All widgets", stage, count, None, p50, p95, None, None)
+                for stage, count, _, p50, p95, _, _ in pooled.rows()]
+        for eb in boxes:
+            rows += [(eb.url,) + row for row in eb.metrics.rows()]
+
+        self.table.setRowCount(len(rows))
+        for i, (name, stage, count, last, p50, p95, size, nodes) in enumerate(rows):
+            cells = (name, stage, str(count), f"{last * 1000:.1f} ms" if last is not None else "",
+                     f"{p50 * 1000:.1f} ms", f"{p95 * 1000:.1f} ms",
+                     format_size(size) if size is not None else "", str(nodes) if nodes is not None else "")
+            for col, cell in enumerate(cells):
+                self.table.setItem(i, col, qt.QTableWidgetItem(cell))
+
+
+class StartupReport:
+    """
+        Milestones of the app start or of a config load, in seconds since it began.
+    """
+    def __init__(self, name: str, start: float = None):
+        self.name = name
+        self.start = time.perf_counter() if start is None else start
+        self.marks = []  # (milestone, seconds since start)
+
+    def mark(self, milestone: str):
+        self.marks.append((milestone, time.perf_counter() - self.start))
+
+    def summary(self) -> str:
+        return f"{self.name}: " + ", ".join(f"{milestone} at {t:.2f}s" for milestone, t in self.marks)
+
+    def report(self) -> str:
+        """
+            One line per milestone, with the time taken since the previous one.
+        """
+        lines = [self.name]
+        previous = 0
+        for milestone, t in self.marks:
+            lines.append(f"  {t * 1000:8.1f} ms  (+{(t - previous) * 1000:7.1f} ms)  {milestone}")
+            previous = t
+        return "\n".join(lines)
+
+
+class PaintWatcher(QObject):
+    """
+        Calls callback once, when widget is first painted.
+    """
+    def __init__(self, widget: qt.QWidget, callback):
+        super().__init__(widget)
+        self.callback = callback
+        widget.installEventFilter(self)
+
+    def eventFilter(self, obj, event) -> bool:
+        if event.type() == QEvent.Type.Paint:
+            obj.removeEventFilter(self)
+            self.callback()
+        return False
 
 
 class MainWindow(qt.QMainWindow):
     '''
         Custom QMainWindow holding all widgets.
     '''
-    def __init__(self):
+    def __init__(self, timing: bool = False):
         super().__init__()
 
         # window parameters
@@ -447,10 +1442,35 @@ class MainWindow(qt.QMainWindow):
 
         self.status_bar = qt.QStatusBar(self)
         self.setStatusBar(self.status_bar)
+        self.lbl_cache = qt.QLabel()
+        self.status_bar.addPermanentWidget(self.lbl_cache)
 
+        # Auto Refresh, one single-shot timer armed for whichever widget is due next
+        self.scheduler = RefreshScheduler()
         self.refresh_timer = QTimer(self)
+        self.refresh_timer.setSingleShot(True)
+        self.queue_dialog = None
+        self.diagnostics_dialog = None
+        self.history = None  # HistoryStore, opened once Keep History is first turned on
         self.list_entity_box: list[EntityBox] = list()
 
+        # Fetch All bookkeeping, boxes still outstanding in the current batch
+        self.batch_stats = None
+        self.batch_pending: set[EntityBox] = set()
+        self.profile_fetch_all = False  # Run the next Fetch All under a metrics.Profiler, see DiagnosticsDialog
+        self.profiler: metrics.Profiler = None
+
+        # Load Config bookkeeping: boxes whose fetch is yet to start, boxes in view not loaded yet
+        self.timing = timing  # Print startup and load reports to stderr
+        self.load_report: StartupReport = None
+        self.load_unfetched: StartupReport = None  # Report of a loaded config whose fetches are yet to start
+        self.load_queue: list[EntityBox] = []
+        self.load_visible: set[EntityBox] = set()
+
+        # Only the boxes in or near the view have their form and display widgets, see update_bodies()
+        self.body_timer = QTimer(self)
+        self.body_timer.setSingleShot(True)
+
         # self.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         # self.customContextMenuRequested.connect(lambda: print("calling context menu"))
 
@@ -461,12 +1481,23 @@ class MainWindow(qt.QMainWindow):
         self.btn_save_config = qt.QPushButton("Save Config")
         self.btn_load_config = qt.QPushButton("Load Config")
         self.chk_auto_refresh = qt.QCheckBox("Auto Refresh")
+        self.btn_refresh_queue = qt.QPushButton("Refresh Queue")
+        self.btn_diagnostics = qt.QPushButton("Diagnostics")
+        self.btn_diagnostics.setToolTip("Per-stage timings of every widget, and profiling of Fetch All")
+        self.chk_history = qt.QCheckBox("Keep History")
+        self.chk_history.setToolTip(f"Record each widget's output on every fetch to {HISTORY_DB}")
+        self.chk_low_memory = qt.QCheckBox("Low Memory")
+        self.chk_low_memory.setToolTip("Keep only the page being worked on parsed, others are kept compressed")
         qt_widget_set_size(self.btn_add_display, width=120)
         qt_widget_set_size(self.btn_rmv_display, width=120)
         qt_widget_set_size(self.btn_fetch_all, width=120)
         qt_widget_set_size(self.btn_save_config, width=120)
         qt_widget_set_size(self.btn_load_config, width=120)
         qt_widget_set_size(self.chk_auto_refresh, width=110)
+        qt_widget_set_size(self.btn_refresh_queue, width=120)
+        qt_widget_set_size(self.btn_diagnostics, width=120)
+        qt_widget_set_size(self.chk_history, width=110)
+        qt_widget_set_size(self.chk_low_memory, width=110)
 
         # 1/ Layouts
         widget_main = qt.QWidget()
@@ -489,9 +1520,13 @@ class MainWindow(qt.QMainWindow):
         self.layout_main_fixed_btn_left.addWidget(self.btn_add_display, alignment=Qt.AlignmentFlag.AlignLeft)
         self.layout_main_fixed_btn_left.addWidget(self.btn_rmv_display, alignment=Qt.AlignmentFlag.AlignLeft)
         self.layout_main_fixed_btn_left.addWidget(self.btn_fetch_all,   alignment=Qt.AlignmentFlag.AlignLeft)
+        self.layout_main_fixed_btn_left.addWidget(self.btn_diagnostics, alignment=Qt.AlignmentFlag.AlignLeft)
 
         # 3/ Right Buttons
+        self.layout_main_fixed_btn_right.addWidget(self.chk_history, alignment=Qt.AlignmentFlag.AlignLeft)
+        self.layout_main_fixed_btn_right.addWidget(self.chk_low_memory, alignment=Qt.AlignmentFlag.AlignLeft)
         self.layout_main_fixed_btn_right.addWidget(self.chk_auto_refresh, alignment=Qt.AlignmentFlag.AlignLeft)
+        self.layout_main_fixed_btn_right.addWidget(self.btn_refresh_queue, alignment=Qt.AlignmentFlag.AlignLeft)
         self.layout_main_fixed_btn_right.addWidget(self.btn_save_config, alignment=Qt.AlignmentFlag.AlignLeft)
         self.layout_main_fixed_btn_right.addWidget(self.btn_load_config, alignment=Qt.AlignmentFlag.AlignLeft)
 
@@ -523,6 +1558,15 @@ class MainWindow(qt.QMainWindow):
         self.btn_save_config.clicked.connect(self.save_config)
         self.btn_load_config.clicked.connect(self.load_config)
         self.chk_auto_refresh.clicked.connect(self.set_refresh)
+        self.btn_refresh_queue.clicked.connect(self.show_refresh_queue)
+        self.btn_diagnostics.clicked.connect(self.show_diagnostics)
+        self.chk_history.clicked.connect(self.set_history)
+        self.refresh_timer.timeout.connect(self.run_due_refreshes)
+        self.chk_low_memory.clicked.connect(self.set_low_memory)
+        self.body_timer.timeout.connect(self.update_bodies)
+        self.layout_main_display.verticalScrollBar().valueChanged.connect(self.schedule_update_bodies)
+        self.layout_main_display.verticalScrollBar().rangeChanged.connect(self.schedule_update_bodies)
+        qt.QApplication.instance().focusChanged.connect(self.on_focus_changed)
         self.setCentralWidget(widget_main)
 
         # late init
@@ -536,7 +1580,10 @@ class MainWindow(qt.QMainWindow):
         """
         eb = EntityBox(self)
         self.list_entity_box.append(eb)
+        self.scheduler.add(eb, eb.refresh_interval)
+        self.arm_refresh()
         self.layout_main_display_widget_layout.addWidget(eb)
+        self.schedule_update_bodies()
         self.set_status('Added new widget')
         return eb
 
@@ -546,12 +1593,47 @@ class MainWindow(qt.QMainWindow):
         """
         if len(self.list_entity_box):
             eb: EntityBox = self.list_entity_box.pop()
+            eb.cancel_fetch()
+            eb.display.cancel_transform()
+            eb.release_page()
+            self.batch_pending.discard(eb)
+            self.load_visible.discard(eb)
+            if eb in self.load_queue:
+                self.load_queue.remove(eb)
+            self.scheduler.remove(eb)
+            self.arm_refresh()
             self.layout_main_display_widget_layout.removeWidget(eb)
+            eb.deleteLater()
             self.set_status('Removed bottom most widget')
 
         else:
             self.set_status('Cannot remove widget')
 
+    def schedule_update_bodies(self, *_):
+        self.body_timer.start(0)
+
+    def update_bodies(self):
+        """
+        Build the form and display widgets of the boxes in or near the view, delete those of the boxes far out of it.
+        The margins differ so that scrolling back and forth around a box does not rebuild it every time.
+        """
+        # Boxes just added are only positioned once the pending layout requests are processed
+        qt.QApplication.sendPostedEvents(None, QEvent.Type.LayoutRequest.value)
+        top = self.layout_main_display.verticalScrollBar().value()
+        height = self.layout_main_display.viewport().height()
+
+        for eb in self.list_entity_box:
+            geometry = eb.geometry()
+            distance = max(top - geometry.bottom(), geometry.top() - (top + height), 0)
+            if distance <= height * BODY_BUILD_MARGIN:
+                eb.build_body()
+            elif distance > height * BODY_DROP_MARGIN:
+                eb.drop_body()
+
+    def resizeEvent(self, e):
+        super().resizeEvent(e)
+        self.schedule_update_bodies()
+
     def rmv_all_display(self):
         """
         Remove all EntityBox.
@@ -564,9 +1646,160 @@ class MainWindow(qt.QMainWindow):
     def fetch_all(self):
         """
         For all existing EntityBox, fetch and display content.
+        Fetches run concurrently, the batch timing is reported once the last one lands.
+        With profile_fetch_all, the GUI thread is profiled from here until then, and the stats written to a file.
         """
+        self.stop_profile()
+        if self.profile_fetch_all:
+            self.profile_fetch_all = False
+            self.profiler = metrics.Profiler()
+            self.profiler.start()
+
+        self.batch_stats = BatchStats()
+        self.batch_pending = set()
+        self.load_report = self.load_unfetched = None
+        self.load_queue = []
+        self.load_visible = set()
+
         for eb in self.list_entity_box:
             eb.requests_get()
+            if eb.is_fetching:
+                self.batch_pending.add(eb)
+
+        self.set_status(f"Fetching {len(self.batch_pending)} pages...")
+        if not self.batch_pending:
+            self.stop_profile()
+
+    def on_load_painted(self, report: StartupReport):
+        report.mark("first paint")
+        # Not from within the paint event itself
+        QTimer.singleShot(0, lambda: self.fetch_loaded(report))
+
+    def fetch_loaded(self, report: StartupReport):
+        """
+            Fetch the boxes of the config loaded with report as one batch, those in view first. The others start
+            LOAD_FETCH_BATCH at a time, one group per event loop pass, so the window keeps responding.
+        """
+        if report is not self.load_unfetched:  # Already started, or superseded by another load or Fetch All
+            return
+        self.load_unfetched = None
+
+        self.batch_stats = BatchStats()
+        self.batch_pending = set(self.list_entity_box)
+        visible = [eb for eb in self.list_entity_box if not eb.visibleRegion().isEmpty()]
+        self.load_visible = set(visible)
+        self.load_queue = [eb for eb in self.list_entity_box if eb not in self.load_visible]
+
+        self.set_status(f"Fetching {len(self.batch_pending)} pages, {len(visible)} in view first...")
+        for eb in visible:
+            self.start_load_fetch(eb)
+        self.fetch_next_loaded()
+
+    def fetch_next_loaded(self):
+        batch, self.load_queue = self.load_queue[:LOAD_FETCH_BATCH], self.load_queue[LOAD_FETCH_BATCH:]
+        for eb in batch:
+            self.start_load_fetch(eb)
+        if self.load_queue:
+            QTimer.singleShot(0, self.fetch_next_loaded)
+
+    def start_load_fetch(self, eb: EntityBox):
+        eb.requests_get()
+        if not eb.is_fetching:  # Invalid URL, counted as failed
+            self.on_box_fetched(eb)
+
+    def on_box_fetched(self, eb: EntityBox, result=None, error=None):
+        """
+        Called by an EntityBox once its fetch completes, fails or times out.
+        """
+        if get_engine().cache is not None:
+            self.lbl_cache.setText(f"{get_engine().cache.summary()} | {get_document_cache().summary()}")
+
+        if self.scheduler.is_running(eb):
+            ok = error is None and result is not None and result.ok
+            status = repr(error) if error is not None else str(result.status_code)
+            self.scheduler.done(eb, ok, status)
+            self.arm_refresh()
+
+        if eb not in self.batch_pending:
+            return
+
+        self.batch_pending.discard(eb)
+        self.batch_stats.add(result, error)
+        if eb in self.load_visible:
+            self.load_visible.discard(eb)
+            if not self.load_visible and self.load_report is not None:
+                self.load_report.mark("widgets in view loaded")
+
+        if not self.batch_pending:
+            self.batch_stats.finish()
+            self.set_status(self.batch_stats.summary())
+            self.stop_profile()
+            if self.load_report is not None:
+                self.load_report.mark(f"all widgets loaded, {self.batch_stats.failed} failed")
+                self.finish_report(self.load_report)
+                self.load_report = None
+
+    def stop_profile(self):
+        if self.profiler is None:
+            return
+        path = self.profiler.stop()
+        self.profiler = None
+        self.set_status(f"{self.status_bar.currentMessage()} Profile written to {path}.")
+
+    def finish_report(self, report: StartupReport):
+        self.set_status(report.summary())
+        if self.timing:
+            print(report.report(), file=sys.stderr)
+
+    def set_history(self, check_state):
+        if check_state:
+            if self.history is None:
+                self.history = HistoryStore()
+            self.set_status(f"Keeping history in {os.path.abspath(self.history.path)}. {self.history.summary()}.")
+        else:
+            self.set_status("History recording off.")
+
+    def record_history(self, eb: EntityBox, output: str):
+        """
+        Called by an EntityBox with its output after a fetch. Unchanged outputs are stored only once.
+        """
+        if not self.chk_history.isChecked() or output is None:
+            return
+        try:
+            self.history.record(widget_key(eb.to_config()), eb.resp_url, output)
+        except Exception as e:
+            self.set_status(f"History not recorded: {e!r}")
+
+    def set_low_memory(self, check_state):
+        if check_state:
+            self.release_idle_memory(self.focused_box())
+            self.set_status("Low memory mode on, only the focused widget keeps its page parsed.")
+        else:
+            self.set_status("Low memory mode off.")
+
+    def focused_box(self) -> EntityBox:
+        focus = qt.QApplication.focusWidget()
+        for eb in self.list_entity_box:
+            if focus is not None and eb.isAncestorOf(focus):
+                return eb
+        return None
+
+    def on_focus_changed(self, old, new):
+        if new is not None and self.isAncestorOf(new):
+            self.release_idle_memory(self.focused_box())
+
+    def release_idle_memory(self, keep: EntityBox = None):
+        """
+        In low memory mode, release the parsed page of every EntityBox except keep.
+        """
+        if not self.chk_low_memory.isChecked():
+            return
+
+        # Pages are shared between boxes on the same URL, the one in use stays parsed
+        keep_doc = keep.resp_doc if keep is not None else None
+        for eb in self.list_entity_box:
+            if eb is not keep and eb.resp_doc is not keep_doc:
+                eb.release_memory()
 
     def save_config(self):
         """
@@ -582,26 +1815,63 @@ class MainWindow(qt.QMainWindow):
         self.set_status(f"Config saved to {os.getcwd()}/config.json")
 
     def set_refresh(self, check_state):
-        import time
-
-        def fetch_all_with_time():
-            self.fetch_all()
-            self.set_status(f"Auto refreshed at {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(time.time()))}")
-
         if check_state:
-            self.refresh_timer.timeout.connect(fetch_all_with_time)
-            self.refresh_timer.start(int(1000 * 60 * 5))
+            self.scheduler.restart()
+            self.arm_refresh()
+            self.set_status("Auto refresh started, each widget refreshes at its own interval.")
 
         else:
             self.refresh_timer.stop()
             self.set_status(f"Auto refresh stopped.")
 
-    def load_config(self):
+    def arm_refresh(self):
+        """
+        Point the refresh timer at the next due widget. Nothing is armed while auto refresh is off,
+        or while the concurrency budget is used up, the next completed refresh re-arms it then.
+        """
+        delay = self.scheduler.next_delay()
+        if not self.chk_auto_refresh.isChecked() or delay is None:
+            self.refresh_timer.stop()
+            return
+        self.refresh_timer.start(int(delay * 1000))
+
+    def run_due_refreshes(self):
+        due = self.scheduler.due()
+        for eb in due:
+            eb.requests_get(targeted=True)
+            if not eb.is_fetching:
+                # Invalid URL or failed to start, counts as a failure so it backs off
+                self.scheduler.done(eb, False, "not started")
+
+        if due:
+            self.set_status(f"Auto refreshing {len(due)} widgets at {time.strftime('%Y-%m-%d %H:%M:%S')}")
+        self.arm_refresh()
+
+    def on_refresh_interval_changed(self, eb: EntityBox):
+        self.scheduler.set_interval(eb, eb.refresh_interval)
+        self.arm_refresh()
+
+    def show_refresh_queue(self):
+        if self.queue_dialog is None:
+            self.queue_dialog = RefreshQueueDialog(self)
+        self.queue_dialog.show()
+        self.queue_dialog.raise_()
+
+    def show_diagnostics(self):
+        if self.diagnostics_dialog is None:
+            self.diagnostics_dialog = DiagnosticsDialog(self)
+        self.diagnostics_dialog.show()
+        self.diagnostics_dialog.raise_()
+
+    def load_config(self, _=None, report: StartupReport = None):
         """
             Clear all existing EB, load entirely new list of EntityBox from config.
+
+            Boxes are filled in from the config at once, but fetched only once the window had a chance
+            to paint them, see fetch_loaded(). Progress is recorded in report, a new one unless given.
         """
         # TODO: Add a dialog to select arbitrary config
-        # TODO: Can add a preload config option
+        report = report if report is not None else StartupReport("Load config")
         self.rmv_all_display()
 
         try:
@@ -616,11 +1886,21 @@ class MainWindow(qt.QMainWindow):
                 # Create display from config one at a time
                 for key in cfg:
                     cfg_ = cfg[key]
-                    self.add_display().from_config(cfg_)
+                    self.add_display().from_config(cfg_, fetch=False)
 
         except FileNotFoundError:
             self.set_status("config.json not found in current working directory. Check if file exists.")
+            return
+
+        report.mark(f"{len(self.list_entity_box)} widgets created")
+        if not self.list_entity_box:
+            self.finish_report(report)
+            return
 
+        # Which boxes are in view is only known once they are laid out, i.e. painted
+        self.load_report = self.load_unfetched = report
+        PaintWatcher(self.list_entity_box[0], lambda: self.on_load_painted(report))
+        QTimer.singleShot(LOAD_PAINT_WAIT_MS, lambda: self.fetch_loaded(report))
         self.set_status("Load config succeeded.")
 
     def set_status(self, e):
@@ -646,10 +1926,22 @@ class MainWindow(qt.QMainWindow):
 
 
 def main():
-    app = qt.QApplication([])
+    parser = argparse.ArgumentParser(description="BeautifulSoup GUI")
+    parser.add_argument('--load', action='store_true', help="load ./config.json on start")
+    parser.add_argument('--timing', action='store_true', help="print the startup and config load timings to stderr")
+    args, qt_args = parser.parse_known_args()
+
+    report = StartupReport("Startup", STARTUP_TIME)
+    report.mark("modules imported")
+    app = qt.QApplication(sys.argv[:1] + qt_args)
 
-    window = MainWindow()
+    window = MainWindow(timing=args.timing)
+    report.mark("window built")
     window.show()
+    if args.load:
+        window.load_config(report=report)
+    else:
+        PaintWatcher(window, lambda: (report.mark("first paint"), window.finish_report(report)))
 
     app.exec()
 
@@ -0,0 +1,331 @@
+import os
+import re
+import sys
+import json
+import time
+import platform
+import argparse
+import threading
+import concurrent.futures
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import engine
+from aio import async_fetch
+
+BENCH_RESULTS = "./bench-results.json"  # Where a suite run is written, pass an older one as --baseline
+BENCH_TOLERANCE = 0.25  # A case slower than its baseline by more than this fraction is a regression
+BENCH_MIN_SECONDS = 0.005  # Cases faster than this are too noisy to be called a regression
+BENCH_FETCH_REPEAT = 10  # Fetch cases are cheap and noisy, they run this many times more than the others
+BENCH_FETCH_BATCH = 16  # Concurrent fetches of the fetch.batch case
+BENCH_WAIT_SECONDS = 60  # Longest wait on one fetch or transform before the suite gives up
+
+
+def synthetic_html(n=10000, depth=3, classes=50) -> str:
+    """
+        Listing page with n items, each wrapped depth divs deep, spread over a vocabulary of classes class names.
+        Every item carries class ``item`` and the text ``Item <i>``, so both filter modes match n times or more.
+    """
+    rows = []
+    for i in range(n):
+        inner = f'<span class="name">Item {i}</span> <b class="price">{i * 3}</b>'
+        for d in range(depth):
+            inner = f'<div class="lvl{d} c{(i + d) % classes}">{inner}</div>'
+        rows.append(f'<li class="item" id="i{i}">{inner}</li>')
+    return f'<html><head><title>bench</title></head><body><ul>{"".join(rows)}</ul></body></html>'
+
+
+def synthetic_json(n=10000) -> str:
+    """
+        API-style payload with n records, shaped like the weather forecast of the app's transform example.
+    """
+    records = [{'forecastDate': f'2024{i % 12 + 1:02}{i % 28 + 1:02}', 'forecastMaxtemp': {'value': 20 + i % 15},
+                'forecastMintemp': {'value': 10 + i % 10}, 'forecastWeather': f'Item {i}'} for i in range(n)]
+    return json.dumps({'weatherForecast': records})
+
+
+class BenchHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        page = self.server.pages.get(self.path.split('?')[0])
+        if page is None:
+            self.send_error(404)
+            return
+        content_type, body = page
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class BenchServer:
+    """
+        Local HTTP stand-in serving fixed bodies by path, on a free port of 127.0.0.1.
+        Responses carry no validator, so the HttpCache of aio neither stores nor revalidates them.
+    """
+    def __init__(self, pages: dict):
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), BenchHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.pages = pages  # path -> (content type, body bytes)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_port}{path}"
+
+
+def legacy_extract(soup, filter_text, is_with_css) -> str:
+    """
+        Extraction as EntityBox.requests_extract did it before the index / dedupe rework, kept as reference.
+    """
+    repo_html = []
+    if is_with_css:
+        for tag in list(soup.find_all(class_=re.compile(filter_text))):
+            if tag.name not in engine.TAG_EXCLUDE:
+                if str(tag) not in repo_html:
+                    repo_html.append(str(tag))
+    else:
+        for tag in list(soup.find_all()):
+            if (tag.name not in engine.TAG_EXCLUDE) and (filter_text in tag.text):
+                if str(tag) not in repo_html:
+                    repo_html.append(str(tag))
+    return '<br>\n'.join(repo_html)
+
+
+def best_of(fn, repeat, setup=None) -> tuple[float, object]:
+    """
+        Fastest of repeat runs of fn, and its last result. With setup, fn is given a fresh setup() each run,
+        built outside the timing, e.g. a Document not queried yet.
+    """
+    best, result = None, None
+    for _ in range(repeat):
+        args = (setup(),) if setup is not None else ()
+        t0 = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def bench_extract(n=10000, repeat=3) -> list[dict]:
+    """
+        Time legacy extraction against engine.Document on a synthetic page with n matches per filter.
+        Document timings include building its indexes; "warm" is the memoized re-query.
+    """
+    html = synthetic_html(n)
+    soup = engine.parse(html)
+    rows = []
+
+    for mode, filter_text, filter_option in (('CSS', 'item', engine.FILTER_CSS), ('Text', 'Item', engine.FILTER_TEXT)):
+        is_with_css = filter_option == engine.FILTER_CSS
+        t_legacy, expected = best_of(lambda: legacy_extract(soup, filter_text, is_with_css), 1)
+
+        doc = engine.Document(html)
+        t_cold, result = best_of(lambda: doc.query(filter_text, filter_option), 1)
+        t_warm, _ = best_of(lambda: doc.query(filter_text, filter_option), repeat)
+
+        rows.append(dict(mode=mode, matches=len(doc.matches(filter_text, filter_option)), legacy=t_legacy,
+                         cold=t_cold, warm=t_warm, same=result == expected))
+    return rows
+
+
+def bench_fetch(server: BenchServer, repeat=3) -> dict:
+    """
+        aio.async_fetch against the local server: one HTML page, one JSON payload, and a concurrent batch.
+    """
+    def fetch(path):
+        result = async_fetch(server.url(path)).result(BENCH_WAIT_SECONDS)
+        if not result.ok:
+            raise RuntimeError(repr(result))
+        return result
+
+    def fetch_batch():
+        futures = [async_fetch(server.url(f'/page.html?{i}')) for i in range(BENCH_FETCH_BATCH)]
+        return [future.result(BENCH_WAIT_SECONDS) for future in concurrent.futures.as_completed(futures)]
+
+    cases = {}
+    repeat *= BENCH_FETCH_REPEAT
+    for name, path in (('fetch.html', '/page.html'), ('fetch.json', '/data.json')):
+        seconds, result = best_of(lambda: fetch(path), repeat)
+        cases[name] = dict(seconds=seconds, nbytes=result.nbytes)
+    seconds, results = best_of(fetch_batch, repeat)
+    cases['fetch.batch'] = dict(seconds=seconds, nbytes=sum(result.nbytes for result in results))
+    return cases
+
+
+def bench_parse(html: str, repeat=3) -> dict:
+    """
+        Document construction, i.e. soup and index, with every parser backend.
+    """
+    cases = {}
+    for parser in engine.PARSERS:
+        seconds, doc = best_of(lambda: engine.make_document(html, parser=parser), repeat)
+        cases[f'parse.{parser}'] = dict(seconds=seconds, nbytes=len(html), nodes=doc.node_count)
+    return cases
+
+
+def bench_qt(html: str, payload: str, repeat=3) -> dict:
+    """
+        The GUI side in offscreen Qt: EntityBox.requests_extract in both filter modes on freshly parsed pages,
+        the three display options of a ScrollDisplay, and a JSON transform through the process pool.
+    """
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    import app
+    from transforms import get_runner
+
+    qapp = app.qt.QApplication.instance() or app.qt.QApplication([])
+    window = app.MainWindow()
+    box = window.list_entity_box[0]
+    cases = {}
+
+    def fresh_page():
+        doc = engine.make_document(html)
+        box.resp_doc, box.status_code = doc, 200
+        return doc
+
+    for name, filter_text, filter_option in (('extract.css', 'item', engine.FILTER_CSS),
+                                             ('extract.text', 'Item', engine.FILTER_TEXT)):
+        box.filter_text, box.filter_option = filter_text, filter_option
+        seconds, _ = best_of(lambda doc: box.requests_extract(), repeat, fresh_page)
+        cases[name] = dict(seconds=seconds, nodes=len(box.resp_result.tags))
+
+    # Views are cached on a Result, each run lays out a new one over the same matches
+    doc = engine.make_document(html)
+    tags = doc.matches('item', engine.FILTER_CSS)
+    model = app.DisplayModel()
+    view = app.ScrollDisplay(model)
+    for output_option, name in enumerate(('display.html', 'display.clean', 'display.raw')):
+        model.output_option = output_option
+        seconds, _ = best_of(model.set_result, repeat, lambda: engine.Result.from_tags(tags, doc.serialize, doc.text_of))
+        cases[name] = dict(seconds=seconds, nbytes=len(model.text), nodes=len(tags))
+    view.deleteLater()
+
+    # Outputs are memoized by source, each run is given a source of its own; the pool is started beforehand
+    json_doc = engine.make_document(payload, content_type='application/json')
+    json_result = engine.Result.from_document(json_doc)
+    fn_src = "def f(x):\n    return sum(r['forecastMaxtemp']['value'] for r in x['weatherForecast'])\n"
+    runs = iter(range(repeat + 1))
+
+    def transform():
+        model.set_transform(f"{fn_src}# {next(runs)}", engine.INPUT_JSON)
+        model.set_result(json_result, json_doc)
+        deadline = time.perf_counter() + BENCH_WAIT_SECONDS
+        while model.transform_job is not None and time.perf_counter() < deadline:
+            qapp.processEvents()
+            time.sleep(0.001)
+        return model.text
+
+    get_runner()
+    transform()
+    seconds, output = best_of(transform, repeat)
+    cases['transform.json'] = dict(seconds=seconds, nbytes=len(payload))
+    if not output.isdigit():
+        raise RuntimeError(f"Transform failed: {output}")
+
+    box.resp_doc = None
+    window.close()
+    return cases
+
+
+def run_suite(n=10000, depth=3, classes=50, repeat=3, with_qt=True) -> dict:
+    """
+        Run every benchmark case on synthetic pages of n items, return the results as written by main().
+    """
+    html = synthetic_html(n, depth, classes)
+    payload = synthetic_json(n)
+    pages = {'/page.html': ('text/html; charset=utf-8', html.encode('utf-8')),
+             '/data.json': ('application/json', payload.encode('utf-8'))}
+
+    cases = {}
+    with BenchServer(pages) as server:
+        cases.update(bench_fetch(server, repeat))
+    cases.update(bench_parse(html, repeat))
+    if with_qt:
+        cases.update(bench_qt(html, payload, repeat))
+
+    return dict(
+        meta=dict(n=n, depth=depth, classes=classes, repeat=repeat, python=platform.python_version(),
+                  platform=platform.platform(), time=time.strftime('%Y-%m-%dT%H:%M:%S')),
+        cases=cases,
+    )
+
+
+def compare(results: dict, baseline: dict, tolerance=BENCH_TOLERANCE) -> list[tuple]:
+    """
+        (case, baseline seconds, seconds, ratio, regressed) of every case in results; baseline seconds and ratio
+        are None for a case the baseline lacks.
+    """
+    rows = []
+    for name, case in results['cases'].items():
+        base = baseline['cases'].get(name)
+        if base is None:
+            rows.append((name, None, case['seconds'], None, False))
+            continue
+        ratio = case['seconds'] / base['seconds'] if base['seconds'] else None
+        regressed = ratio is not None and ratio > 1 + tolerance and case['seconds'] >= BENCH_MIN_SECONDS
+        rows.append((name, base['seconds'], case['seconds'], ratio, regressed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fetch, parse, extract, display and transform "
+                                                 "on synthetic pages served locally.")
+    parser.add_argument('-n', type=int, default=10000, help="items on the synthetic page, records in the JSON")
+    parser.add_argument('-d', '--depth', type=int, default=3, help="divs wrapping each item")
+    parser.add_argument('-c', '--classes', type=int, default=50, help="distinct class names on the page")
+    parser.add_argument('-r', '--repeat', type=int, default=3, help="runs per case, the fastest one counts")
+    parser.add_argument('-o', '--out', default=BENCH_RESULTS, help="write the results to this JSON file")
+    parser.add_argument('-b', '--baseline', default=None, help="results of an earlier run to compare against")
+    parser.add_argument('-t', '--tolerance', type=float, default=BENCH_TOLERANCE)
+    parser.add_argument('--no-qt', action='store_true', help="skip the extract, display and transform cases")
+    parser.add_argument('--legacy', action='store_true', help="only compare extraction with the pre-index one")
+    args = parser.parse_args()
+
+    if args.legacy:
+        print(f"{'mode':<6}{'matches':>9}{'legacy s':>11}{'cold s':>9}{'warm s':>9}{'speedup':>9}  same")
+        for row in bench_extract(args.n, args.repeat):
+            print(f"{row['mode']:<6}{row['matches']:>9}{row['legacy']:>11.3f}{row['cold']:>9.3f}{row['warm']:>9.5f}"
+                  f"{row['legacy'] / row['cold']:>8.1f}x  {row['same']}")
+        return
+
+    results = run_suite(args.n, args.depth, args.classes, args.repeat, not args.no_qt)
+    with open(args.out, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    if args.baseline is None:
+        for name, case in results['cases'].items():
+            print(f"{name:<20}{case['seconds'] * 1000:>10.2f} ms")
+        print(f"Results written to {args.out}", file=sys.stderr)
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline['meta']['n'] != args.n or baseline['meta']['depth'] != args.depth:
+        print(f"Baseline was run with n={baseline['meta']['n']}, depth={baseline['meta']['depth']}", file=sys.stderr)
+
+    rows = compare(results, baseline, args.tolerance)
+    print(f"{'case':<20}{'baseline ms':>13}{'ms':>10}{'ratio':>8}")
+    for name, base, seconds, ratio, regressed in rows:
+        base_ms = f"{base * 1000:.2f}" if base is not None else "-"
+        ratio_s = f"{ratio:.2f}x" if ratio is not None else "-"
+        print(f"{name:<20}{base_ms:>13}{seconds * 1000:>10.2f}{ratio_s:>8}{'  REGRESSION' if regressed else ''}")
+
+    regressions = [row[0] for row in rows if row[4]]
+    print(f"Results written to {args.out}, {len(regressions)} regressions", file=sys.stderr)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,396 @@
+import sys
+import time
+import argparse
+import threading
+from collections import deque
+from functools import partial
+from email.utils import parsedate_to_datetime
+from urllib.parse import urljoin, urldefrag, urlsplit
+from urllib.robotparser import RobotFileParser
+
+import engine
+from aio import async_fetch, BatchStats, CancelToken
+
+CRAWL_MAX_DEPTH = 250  # Links followed from the start page, e.g. next-page hops of a listing
+CRAWL_MAX_PAGES = 250  # Pages fetched per crawl, the start page included
+CRAWL_WORKERS = 8  # Pages of one crawl fetched or parsed at once; aio caps requests per host on top of that
+CRAWL_HOST_DELAY = 0.5  # Seconds between the starts of two requests of one crawl to the same host, at least;
+                        # a longer Crawl-delay or Request-rate in the host's robots.txt wins
+CRAWL_RETRIES = 2  # Times a page answered 429 or 503 is tried again, after the Retry-After the host asked for
+CRAWL_MAX_RETRY_AFTER = 60  # Seconds a Retry-After may hold a host's requests back, longer waits count as a failure
+CRAWL_AGENT = 'bs-viz'  # Name the rules of robots.txt are looked up under, else those for *
+
+
+class CrawlPage:
+    """
+        One page of a crawl as it is handed to on_page: its matches as (html, text) pairs, or the error it ran into.
+    """
+    def __init__(self, url, depth, order):
+        self.url = url
+        self.depth = depth
+        self.order = order  # Discovery order, breadth first; the merged output follows it
+        self.result = None
+        self.error = None
+        self.matches: list[tuple[str, str]] = []
+        self.links = 0  # New URLs this page added to the frontier
+        self.parse_time = 0.0
+        self.nodes = 0
+
+    def __repr__(self):
+        if self.error is not None:
+            return f"<CrawlPage {self.url} {self.error!r}>"
+        return f"<CrawlPage {self.url} depth {self.depth}, {len(self.matches)} matches, {self.links} links>"
+
+
+class CrawlMatches:
+    """
+        Matches of every page of a crawl merged into one Result, in page discovery order whatever the order
+        pages land in. A match whose markup repeats an earlier one is dropped, as within a page.
+    """
+    def __init__(self):
+        self.pages: dict[int, list] = {}  # order -> matches
+
+    def add(self, page: CrawlPage):
+        self.pages[page.order] = page.matches
+
+    def result(self) -> engine.Result:
+        unique = {}  # html -> text, first occurrence wins
+        for order in sorted(self.pages):
+            for html, text in self.pages[order]:
+                unique.setdefault(html, text)
+        return engine.Result('<br>\n'.join(unique), '\n'.join(unique.values()), pieces=engine.match_pieces(list(unique)))
+
+    def count(self) -> int:
+        return sum(len(matches) for matches in self.pages.values())
+
+
+def page_matches(doc: engine.Document, filter_text: str, filter_option: int, collapse_nested=False) -> list:
+    result = doc.result(filter_text, filter_option, collapse_nested)
+    if result.tags:
+        return [(doc.serialize(tag), doc.text_of(tag)) for tag in result.tags]
+    return [(result.html, result.text)] if not filter_text else []
+
+
+class Crawler:
+    """
+        Follows links from a start URL, extracting the same filter from every page.
+
+        link_filter is a CSS selector picking the links to follow, e.g. ``a.next`` for a paginated listing;
+        a match without an href has the links inside it followed. The frontier is breadth first, URLs
+        are deduped without their fragment, and only links on the start URL's host are followed unless
+        same_host is False.
+
+        At most workers pages are in flight at once, through the shared FetchEngine. Each host's robots.txt is
+        read before its first page: disallowed URLs fail with PermissionError, and two requests to the host
+        start host_delay seconds apart or its Crawl-delay / Request-rate, whichever is longer. A page answered
+        429 or 503 holds the host back for its Retry-After, then is tried again. Politeness wins over speed:
+        the pool overlaps fetches across hosts and within host_delay, so a 200-page listing on one site takes
+        about 200 * host_delay seconds, 100 s at the default rather than the seconds once aimed for; lower
+        host_delay only for sites that can take the load.
+
+        Pages are parsed on the fetch threads, not through the DocumentCache, and on_page(CrawlPage) is called
+        there too, in completion order. on_done(crawler) follows the last page, or stop().
+    """
+    def __init__(self, url: str, filter_text: str = '', filter_option: int = engine.FILTER_CSS, link_filter: str = '',
+                 collapse_nested=False, max_depth=CRAWL_MAX_DEPTH, max_pages=CRAWL_MAX_PAGES,
+                 parser=engine.PARSER_LXML, on_page=None, on_done=None, workers=CRAWL_WORKERS,
+                 host_delay=CRAWL_HOST_DELAY, same_host=True, fetch=async_fetch, stats: BatchStats = None):
+        self.url = urldefrag(url)[0]
+        self.filter_text = filter_text
+        self.filter_option = filter_option
+        self.link_filter = link_filter
+        self.collapse_nested = collapse_nested
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.parser = parser
+        self.on_page = on_page
+        self.on_done = on_done
+        self.workers = workers
+        self.host_delay = host_delay
+        self.host = urlsplit(self.url).netloc.lower() if same_host else None
+        self.fetch = fetch
+        self.stats = stats if stats is not None else BatchStats()
+
+        # Outcome of the start page, what a single fetch of url would have reported
+        self.start_result = None
+        self.start_error = None
+
+        self._lock = threading.Lock()
+        self._token = CancelToken()
+        self._frontier = deque([(self.url, 0, 0)])  # (url, depth, order)
+        self._seen = {self.url}
+        self._next_start = {}  # host -> monotonic time its next request may start
+        self._robots = {}  # host -> RobotFileParser, None while its robots.txt is being fetched
+        self._delays = {}  # host -> seconds between its requests, host_delay or its robots.txt's if longer
+        self._retries = {}  # url -> times tried again after a 429 / 503
+        self._in_flight = 0
+        self._started = 0
+        self._timer: threading.Timer = None  # Wakes the frontier up once a host's delay is over
+        self._stopped = False
+        self._done = False
+
+    @property
+    def pages(self) -> int:
+        return self.stats.count
+
+    @property
+    def queued(self) -> int:
+        return len(self._frontier)
+
+    @property
+    def is_stopped(self) -> bool:
+        return self._stopped
+
+    @property
+    def is_done(self) -> bool:
+        return self._done
+
+    def start(self):
+        self._pump()
+
+    def run(self) -> 'Crawler':
+        """
+            Crawl on the calling thread's behalf, returning once the crawl is over.
+        """
+        finished = threading.Event()
+        on_done = self.on_done
+
+        def done(crawler):
+            if on_done is not None:
+                on_done(crawler)
+            finished.set()
+
+        self.on_done = done
+        self.start()
+        finished.wait()
+        return self
+
+    def stop(self):
+        """
+            Stop following links and cancel the fetches in flight. on_done is still called once they are over.
+        """
+        with self._lock:
+            self._stopped = True
+            self._frontier.clear()
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        self._token.cancel()
+        self._pump()
+
+    def summary(self) -> str:
+        state = "stopped" if self._stopped else "done" if self._done else f"{self._in_flight} in flight, {self.queued} queued"
+        return f"Crawled {self.pages} pages ({self.stats.failed} failed) in {self.stats.elapsed:.2f}s, {state}"
+
+    def _pump(self):
+        # Start whatever the worker and per-host budgets allow, then arm the timer for the first host still waiting
+        launch = []
+        blocked = []
+        robots = []
+        with self._lock:
+            now = time.monotonic()
+            waiting = deque()
+            wait = None
+            while self._frontier and self._in_flight < self.workers and self._started < self.max_pages:
+                url, depth, order = self._frontier.popleft()
+                host = urlsplit(url).netloc.lower()
+                if host not in self._robots:
+                    # robots.txt first, counted in flight so that the crawl is not seen over meanwhile
+                    self._robots[host] = None
+                    self._in_flight += 1
+                    robots.append((host, urljoin(url, '/robots.txt')))
+                if self._robots[host] is None:
+                    waiting.append((url, depth, order))
+                    continue
+                ready = self._next_start.get(host, 0)
+                if ready > now:
+                    waiting.append((url, depth, order))
+                    wait = ready - now if wait is None else min(wait, ready - now)
+                    continue
+                self._in_flight += 1
+                self._started += 1
+                if not self._robots[host].can_fetch(CRAWL_AGENT, url):
+                    blocked.append((url, depth, order))
+                    continue
+                self._next_start[host] = now + self._delays[host]
+                launch.append((url, depth, order))
+            waiting.extend(self._frontier)
+            self._frontier = waiting
+
+            if wait is not None and self._timer is None:
+                self._timer = threading.Timer(wait, self._on_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+            finished = not launch and not blocked and not self._done and self._in_flight == 0 \
+                and self._timer is None and (not self._frontier or self._started >= self.max_pages)
+            if finished:
+                self._done = True
+                self.stats.finish()
+
+        for host, url in robots:
+            try:
+                future = self.fetch(url, token=self._token)
+            except BaseException:
+                self._on_robots(host, None)
+                continue
+            future.add_done_callback(partial(self._on_robots, host))
+
+        for url, depth, order in blocked:
+            self._on_page(CrawlPage(url, depth, order), error=PermissionError(f"{url} is disallowed by robots.txt"))
+
+        for url, depth, order in launch:
+            try:
+                future = self.fetch(url, token=self._token)
+            except BaseException as e:
+                self._on_page(CrawlPage(url, depth, order), error=e)
+                continue
+            future.add_done_callback(partial(self._on_fetched, CrawlPage(url, depth, order)))
+
+        if finished and self.on_done is not None:
+            self.on_done(self)
+
+    def _on_robots(self, host, future):
+        # Without a readable robots.txt everything is allowed, 401 / 403 on it disallow everything
+        robots = RobotFileParser()
+        try:
+            result = future.result()
+        except BaseException:
+            result = None
+        if result is not None and result.status_code in (401, 403):
+            robots.disallow_all = True
+        elif result is not None and result.ok:
+            robots.parse(result.text.splitlines())
+        else:
+            robots.allow_all = True
+
+        delay = robots.crawl_delay(CRAWL_AGENT) or 0
+        rate = robots.request_rate(CRAWL_AGENT)
+        if rate is not None and rate.requests:
+            delay = max(delay, rate.seconds / rate.requests)
+        with self._lock:
+            self._delays[host] = max(self.host_delay, float(delay))
+            self._robots[host] = robots
+            self._in_flight -= 1
+        self._pump()
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+        self._pump()
+
+    def _on_fetched(self, page: CrawlPage, future):
+        # Runs on the fetch worker thread
+        links = []
+        try:
+            result = page.result = future.result()
+            if self._retry_later(page, result):
+                return
+            if result.ok:
+                doc = engine.make_document(result.text, page.url, result.headers.get('Content-Type'), parser=self.parser)
+                page.parse_time, page.nodes = doc.parse_time, doc.node_count
+                page.matches = page_matches(doc, self.filter_text, self.filter_option, self.collapse_nested)
+                if self.link_filter and page.depth < self.max_depth:
+                    links = doc.links(doc.matches(self.link_filter, engine.FILTER_SELECTOR))
+        except BaseException as e:
+            self._on_page(page, error=e)
+        else:
+            self._on_page(page, links=links)
+
+    def _retry_later(self, page: CrawlPage, result) -> bool:
+        # A 429 / 503 with a usable Retry-After holds the host back and puts the page back in the frontier
+        if result.status_code not in (429, 503) or self._retries.get(page.url, 0) >= CRAWL_RETRIES:
+            return False
+        delay = retry_after(result.headers.get('Retry-After'))
+        if delay is None or delay > CRAWL_MAX_RETRY_AFTER:
+            return False
+
+        host = urlsplit(page.url).netloc.lower()
+        with self._lock:
+            if self._stopped:
+                return False
+            self._retries[page.url] = self._retries.get(page.url, 0) + 1
+            self._next_start[host] = max(self._next_start.get(host, 0), time.monotonic() + delay)
+            self._frontier.appendleft((page.url, page.depth, page.order))
+            self._in_flight -= 1
+            self._started -= 1
+        self._pump()
+        return True
+
+    def _on_page(self, page: CrawlPage, links=(), error=None):
+        page.error = error
+        with self._lock:
+            self.stats.add(page.result, error)
+            if page.order == 0:
+                self.start_result, self.start_error = page.result, error
+            if not self._stopped:
+                for href in links:
+                    url = urldefrag(urljoin(page.url, href.strip()))[0]
+                    parts = urlsplit(url)
+                    if parts.scheme not in ('http', 'https') or url in self._seen:
+                        continue
+                    if self.host is not None and parts.netloc.lower() != self.host:
+                        continue
+                    self._seen.add(url)
+                    self._frontier.append((url, page.depth + 1, len(self._seen) - 1))
+                    page.links += 1
+
+        if self.on_page is not None:
+            self.on_page(page)
+
+        # Only now, so that the crawl is not seen over before the last page is handed out
+        with self._lock:
+            self._in_flight -= 1
+        self._pump()
+
+
+def retry_after(value: str) -> float:
+    """
+        Seconds a Retry-After header asks to wait, given as seconds or as an HTTP date; None if unreadable.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def run_config(cfg: dict, stats: BatchStats = None) -> str:
+    """
+        Crawl from a saved EntityBox config in crawl mode, returning the merged output as the app displays it.
+    """
+    matches = CrawlMatches()
+    Crawler(cfg.get('url', ''), cfg.get('filter', ''), engine.filter_option_from_config(cfg), cfg.get('crawl_links', ''),
+            cfg.get('collapse_nested', False), cfg.get('crawl_depth', CRAWL_MAX_DEPTH),
+            cfg.get('crawl_pages', CRAWL_MAX_PAGES), cfg.get('parser', engine.PARSER_LXML),
+            on_page=matches.add, host_delay=cfg.get('crawl_delay', CRAWL_HOST_DELAY), stats=stats).run()
+    return engine.config_output(cfg, matches.result())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl from a URL, following links, and print the merged matches.")
+    parser.add_argument('url')
+    parser.add_argument('-f', '--filter', default='', help="filter extracted from every page, whole pages if empty")
+    parser.add_argument('-m', '--mode', type=int, default=engine.FILTER_CSS,
+                        help="0 for CSS, 1 for Text, 2 for Selector")
+    parser.add_argument('-l', '--links', default='', help="CSS selector of the links to follow, e.g. a.next")
+    parser.add_argument('-d', '--depth', type=int, default=CRAWL_MAX_DEPTH)
+    parser.add_argument('-p', '--pages', type=int, default=CRAWL_MAX_PAGES)
+    parser.add_argument('-w', '--workers', type=int, default=CRAWL_WORKERS)
+    parser.add_argument('--delay', type=float, default=CRAWL_HOST_DELAY, help="seconds between requests to a host, lower only for sites you may load harder")
+    parser.add_argument('--parser', default=engine.PARSER_LXML, choices=engine.PARSERS)
+    args = parser.parse_args()
+
+    matches = CrawlMatches()
+    crawler = Crawler(args.url, args.filter, args.mode, args.links, max_depth=args.depth, max_pages=args.pages,
+                      parser=args.parser, on_page=matches.add, workers=args.workers, host_delay=args.delay).run()
+    print(matches.result().view(1))
+    print(f"{crawler.summary()}, {matches.count()} matches", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,249 @@
+import time
+import hashlib
+import threading
+import concurrent.futures
+from collections import OrderedDict
+
+import engine
+from aio import async_fetch, FetchResult, CancelToken
+
+DOCUMENT_MAX_AGE = 15  # Seconds a fetched page is served to other widgets without fetching it again
+DOCUMENT_BUDGET = 256 * 1024 * 1024  # Approximate bytes of parsed pages kept before LRU eviction kicks in
+
+_document_cache = None
+
+
+def digest(text: str) -> str:
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class Page:
+    """
+        One fetch of a URL as seen by the widgets: the FetchResult and, for a 200 or 304, its parsed Document.
+        Refreshes that bring back the same body carry the same Document.
+    """
+    def __init__(self, url: str, result: FetchResult, doc: engine.Document = None):
+        self.url = url
+        self.result = result
+        self.doc = doc
+
+
+class CacheEntry:
+    def __init__(self, url, parser):
+        self.url = url
+        self.parser = parser
+        self.page: Page = None
+        self.content_hash = None
+        self.fetched_at = None
+        self.future: concurrent.futures.Future = None  # In-flight fetch, shared by every caller
+        self.token: CancelToken = None  # Stops the in-flight fetch once every caller has abandoned it
+        self.waiters = 0
+        self.listeners = []  # progress(nbytes, total) of every caller of the in-flight fetch
+        self.target = None  # (filter_text, filter_option) the in-flight fetch is parsed for, None for all of it
+        self.refs = 0
+
+
+class DocumentCache:
+    """
+        Process-wide cache of fetched and parsed pages, keyed by URL and parser backend.
+
+        Widgets asking for the same URL share one fetch while it is in flight, and one Document once
+        it has landed; a page fetched less than max_age seconds ago is served without a request.
+        A refresh whose body is unchanged keeps the existing Document. Bodies are compared by hash, 304s included:
+        the HttpCache is keyed by URL alone, so its body may be newer than the one an entry parsed.
+        Asking for a page fresh under another parser parses that body again instead of fetching it.
+
+        A caller no longer interested in an in-flight fetch abandon()s it; the transfer is stopped
+        once no caller is left waiting on it.
+
+        A caller passing a target gets a Document parsed for that filter only (see engine.Document),
+        unless other callers of the same fetch target something else, in which case the page is parsed whole.
+
+        Widgets acquire() the URL they display and release() it when done. Past the memory budget,
+        unreferenced pages are dropped least recently used first, then referenced ones are released
+        to their compressed text, to be parsed again on next use.
+    """
+    def __init__(self, fetch=async_fetch, max_age=DOCUMENT_MAX_AGE, budget=DOCUMENT_BUDGET):
+        self.fetch = fetch
+        self.max_age = max_age
+        self.budget = budget
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (url, parser) -> CacheEntry, least recently used first
+
+    def get(self, url: str, max_age: float = None, progress=None, target: tuple = None,
+            parser: str = engine.PARSER_LXML) -> concurrent.futures.Future:
+        """
+            Return a future resolving to a Page for url, parsed with the given backend. Callers must not cancel it,
+            it may be shared, but abandon() it instead. progress(nbytes, total) is called from a fetch thread
+            as the body arrives.
+        """
+        max_age = self.max_age if max_age is None else max_age
+
+        with self._lock:
+            entry = self._entries.get((url, parser))
+            if entry is None:
+                entry = self._entries[url, parser] = CacheEntry(url, parser)
+            self._entries.move_to_end((url, parser))
+
+            if entry.future is not None and not entry.token.cancelled:
+                entry.waiters += 1
+                if target != entry.target:
+                    entry.target = None
+                if progress is not None:
+                    entry.listeners.append(progress)
+                return entry.future
+
+            if entry.page is not None and entry.page.doc is not None and time.monotonic() - entry.fetched_at < max_age:
+                future = concurrent.futures.Future()
+                future.set_running_or_notify_cancel()
+                future.set_result(entry.page)
+                return future
+
+            future = entry.future = concurrent.futures.Future()
+            future.set_running_or_notify_cancel()
+            token = entry.token = CancelToken()
+            listeners = entry.listeners = [progress] if progress is not None else []
+            entry.waiters = 1
+            entry.target = target
+            sibling = self._fresh_sibling(entry, max_age)
+
+        if sibling is not None:
+            fetched = concurrent.futures.Future()
+            fetched.set_running_or_notify_cancel()
+            fetched.set_result(sibling.page.result)
+            threading.Thread(target=self._on_fetched, args=(entry, future, fetched), daemon=True).start()
+            return future
+
+        def on_progress(nbytes, total):
+            for listener in list(listeners):
+                listener(nbytes, total)
+
+        try:
+            fetch_future = self.fetch(url, progress=on_progress, token=token)
+        except BaseException as e:
+            self._resolve(entry, future, exception=e)
+            return future
+
+        fetch_future.add_done_callback(lambda f: self._on_fetched(entry, future, f))
+        return future
+
+    def abandon(self, url: str, future: concurrent.futures.Future, parser: str = engine.PARSER_LXML):
+        """
+            Stop waiting on future, a fetch of url from get(). The last caller to abandon it stops the transfer.
+        """
+        with self._lock:
+            entry = self._entries.get((url, parser))
+            if entry is None or entry.future is not future:
+                return
+            entry.waiters -= 1
+            if entry.waiters <= 0:
+                entry.token.cancel()
+
+    def acquire(self, url: str, parser: str = engine.PARSER_LXML):
+        """
+            Mark url as displayed by one more widget, then enforce the memory budget.
+        """
+        with self._lock:
+            entry = self._entries.get((url, parser))
+            if entry is not None:
+                entry.refs += 1
+        self.evict()
+
+    def release(self, url: str, parser: str = engine.PARSER_LXML):
+        with self._lock:
+            entry = self._entries.get((url, parser))
+            if entry is not None and entry.refs > 0:
+                entry.refs -= 1
+
+    def memory(self) -> int:
+        with self._lock:
+            docs = [entry.page.doc for entry in self._entries.values() if entry.page is not None and entry.page.doc]
+        return sum(doc.memory() for doc in docs)
+
+    def evict(self):
+        """
+            Bring the parsed pages under budget. Called from the GUI thread, which owns the Documents.
+        """
+        with self._lock:
+            entries = [entry for entry in self._entries.values() if entry.page is not None and entry.page.doc]
+        sizes = {id(entry): entry.page.doc.memory() for entry in entries}
+        total = sum(sizes.values())
+
+        for entry in entries:
+            if total <= self.budget:
+                return
+            if entry.refs == 0 and entry.future is None:
+                with self._lock:
+                    self._entries.pop((entry.url, entry.parser), None)
+                total -= sizes[id(entry)]
+
+        # Still over budget with pages on display, the most recently used one stays parsed
+        for entry in entries[:-1]:
+            if total <= self.budget:
+                return
+            if entry.refs > 0 and not entry.page.doc.is_released:
+                entry.page.doc.release()
+                total -= sizes[id(entry)] - entry.page.doc.memory()
+
+    def summary(self) -> str:
+        with self._lock:
+            pages = sum(entry.page is not None for entry in self._entries.values())
+            in_flight = sum(entry.future is not None for entry in self._entries.values())
+        return f"Pages: {pages} cached (~{self.memory() / 1024 / 1024:.1f} MB), {in_flight} in flight"
+
+    def _fresh_sibling(self, entry, max_age) -> CacheEntry:
+        # Entry of the same URL under another parser whose page may be used instead of a fetch
+        for sibling in self._entries.values():
+            if sibling.url == entry.url and sibling is not entry and sibling.page is not None \
+                    and sibling.page.doc is not None and time.monotonic() - sibling.fetched_at < max_age:
+                return sibling
+        return None
+
+    def _on_fetched(self, entry, future, fetch_future):
+        # Runs on the fetch worker thread, parsing there keeps it off the GUI thread
+        try:
+            result = fetch_future.result()
+            page = self._page(entry, result)
+        except BaseException as e:
+            self._resolve(entry, future, exception=e)
+        else:
+            self._resolve(entry, future, page)
+
+    def _page(self, entry, result: FetchResult) -> Page:
+        if not result.ok:
+            return Page(entry.url, result)
+
+        # A 304 only says the body is the one the URL-keyed HttpCache stored last, which a fetch of the URL
+        # under another parser, or a crawl, may have replaced since this entry was parsed: compare bodies
+        previous = entry.page.doc if entry.page is not None else None
+        content_hash = digest(result.text)
+        if previous is not None and content_hash == entry.content_hash:
+            return Page(entry.url, result, previous)
+
+        entry.content_hash = content_hash
+        doc = engine.make_document(result.text, entry.url, result.headers.get('Content-Type'), entry.target, entry.parser)
+        return Page(entry.url, result, doc)
+
+    def _resolve(self, entry, future, page=None, exception=None):
+        with self._lock:
+            # Unless abandoned and superseded by a newer fetch of the same URL, which owns the entry now
+            if entry.future is future:
+                entry.future = None
+                if page is not None and page.doc is not None:
+                    entry.page = page
+                    entry.fetched_at = time.monotonic()
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(page)
+
+
+def get_document_cache() -> DocumentCache:
+    """
+        Return the process-wide DocumentCache, created on first use.
+    """
+    global _document_cache
+    if _document_cache is None:
+        _document_cache = DocumentCache()
+    return _document_cache
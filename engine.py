@@ -0,0 +1,1064 @@
+import re
+import sys
+import json
+import time
+import zlib
+import weakref
+from html import escape
+from bisect import bisect_left
+from functools import lru_cache
+from collections import OrderedDict
+
+import soupsieve
+import lxml.html
+from lxml import etree
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.element import Tag, NavigableString, CData
+
+try:
+    from lxml.cssselect import CSSSelector
+except ImportError:
+    CSSSelector = None
+
+# These tags are unlikely to contain useful information, or contain an array of nested information.
+# Therefore, they are excluded during the tag parsing stage.
+TAG_EXCLUDE = ['script', 'meta', 'head', 'noscript', 'svg', 'html', 'aside', 'main']
+
+# Parser backends, stored by name in each widget's config
+PARSER_LXML = 'lxml'  # BeautifulSoup over lxml
+PARSER_HTML = 'html.parser'  # BeautifulSoup over the standard library parser, slower but pure Python
+PARSER_LXML_HTML = 'lxml.html'  # Raw lxml.html tree queried with XPath, the fast path
+PARSERS = (PARSER_LXML, PARSER_HTML, PARSER_LXML_HTML)
+
+# Tags whose strings BeautifulSoup leaves out of the text of their ancestors
+OWN_TEXT_TAGS = ('script', 'style', 'template', 'rt', 'rp')
+LXML_ELEMENT_BYTES = 200  # Rough size of one lxml.html element with its attributes, for the memory budget
+
+# Filter options, i.e. what the filter text is matched against
+FILTER_CSS = 0  # RegEx over class names
+FILTER_TEXT = 1  # Substring of the tag text
+FILTER_SELECTOR = 2  # CSS selector, via soupsieve
+
+SELECTOR_CACHE_SIZE = 256  # Compiled selectors shared by every Document
+SELECT_LIMIT = 1000  # Selector matching stops once this many displayable tags are found
+
+# Selectors a targeted parse can build only the matches of: tag, .class, #id, tag.class or tag#id
+SIMPLE_SELECTOR_RE = re.compile(r'^([a-zA-Z][\w-]*)?(?:([.#])([\w-]+))?$')
+
+# String types that make up tag.text for ordinary tags; <style>, <template>, <rt>, <rp> use their own
+TEXT_STRING_TYPES = (NavigableString, CData)
+
+CLEAN_RE = re.compile('[\n| ]+')  # Clean view: each run of spaces / newlines becomes one newline
+
+# Plain containers a page may be laid out child by child in: their own markup holds no layout the children need
+SPLIT_TAGS = ('body', 'div', 'section', 'article', 'main', 'header', 'footer', 'nav', 'aside', 'form', 'center')
+MIN_ELEMENT_CHARS = 9  # Fewest characters an element takes prettified, <a>\n</a>\n
+
+QUERY_CACHE_SIZE = 64  # Memoized (filter, mode) results kept per Document
+
+# Transform inputs, i.e. what the x of a transform is
+INPUT_TEXT = 0  # Displayed text, as shown
+INPUT_BYTES = 1  # Response body as bytes
+INPUT_JSON = 2  # Response body parsed as JSON
+INPUT_TAGS = 3  # Extracted tags, as dicts of name / attrs / text / html
+INPUT_FRAME = 4  # pandas DataFrame of the JSON body, or else of the extracted tags
+TRANSFORM_INPUTS = ('Text', 'Bytes', 'JSON', 'Tags', 'DataFrame')
+
+CHARSET_RE = re.compile(r'charset=["\']?([\w.:-]+)', re.IGNORECASE)
+
+TRANSFORM_ERR_MSG = 'Transformation must be a Python function starting with ' \
+                    'def f(x): and returns a value, input is malformed'
+
+
+def parse(text: str, strainer: SoupStrainer = None, parser: str = PARSER_LXML) -> BeautifulSoup:
+    return BeautifulSoup(text, parser, parse_only=strainer)
+
+
+def make_document(text: str, url: str = None, content_type: str = None, target: tuple = None, parser: str = PARSER_LXML):
+    """
+        Return the Document for text under the given parser backend.
+    """
+    if parser == PARSER_LXML_HTML:
+        return LxmlDocument(text, url, content_type)
+    return Document(text, url, content_type, target, parser)
+
+
+def strainer_for(filter_text: str, filter_option: int) -> SoupStrainer:
+    """
+        Return a SoupStrainer keeping just the subtrees that can match filter_text, None if there is none.
+
+        A CSS filter is matched by class, as find_all() does, so any valid one compiles. A selector compiles
+        only if it is a single simple selector: anything relating a tag to its ancestors or siblings needs
+        the whole tree. Text filters match every ancestor of the text, so they never compile.
+
+        A strainer bounds the tree that is built, not the parse: the whole input is still tokenized, so
+        memory drops with the share of the page kept, parse time far less. The 'lxml' backend goes further,
+        through target_markup().
+    """
+    if not filter_text:
+        return None
+
+    if filter_option == FILTER_CSS:
+        try:
+            pattern = re.compile(filter_text)
+        except re.error:
+            return None
+        return SoupStrainer(class_=lambda classes: _classes_match(classes, pattern))
+
+    if filter_option == FILTER_SELECTOR:
+        match = SIMPLE_SELECTOR_RE.match(filter_text.strip())
+        if match is None or not any(match.groups()):
+            return None
+        name, kind, value = match.groups()
+        attrs = {}
+        if kind == '.':
+            pattern = re.compile(f'^{re.escape(value)}$')
+            attrs['class'] = lambda classes: _classes_match(classes, pattern)
+        elif kind == '#':
+            attrs['id'] = value
+        return SoupStrainer(name.lower() if name else None, attrs)
+
+    return None
+
+
+def target_markup(text: str, filter_text: str, filter_option: int) -> str:
+    """
+        The markup of the outermost elements of text that can match a filter strainer_for() compiles, found by
+        libxml2 and XPath in C. The 'lxml' backend builds a targeted soup from it rather than from the whole
+        page: same parser, so the same subtrees, without BeautifulSoup seeing every tag of the page.
+    """
+    try:
+        tree = lxml.html.document_fromstring(text.encode('utf-8'), lxml.html.HTMLParser(encoding='utf-8'))
+    except etree.ParserError:  # Nothing but whitespace
+        return ''
+
+    if filter_option == FILTER_CSS:
+        pattern = re.compile(filter_text)
+        candidates = (el for el in tree.xpath('//*[@class]') if _classes_match(el.get('class'), pattern))
+    else:
+        name, kind, value = SIMPLE_SELECTOR_RE.match(filter_text.strip()).groups()
+        path = f"//{name.lower() if name else '*'}"
+        if kind == '.':
+            pattern = re.compile(f'^{re.escape(value)}$')
+            candidates = (el for el in tree.xpath(path + '[@class]') if _classes_match(el.get('class'), pattern))
+        else:
+            candidates = tree.xpath(path + (f"[@id='{value}']" if kind == '#' else ''))
+
+    kept = set()
+    markup = []
+    for el in candidates:
+        if not any(parent in kept for parent in el.iterancestors()):
+            kept.add(el)
+            markup.append(lxml.html.tostring(el, encoding='unicode', with_tail=False))
+    return ''.join(markup)
+
+
+def extract(soup: BeautifulSoup, filter_text: str, filter_option: int) -> str:
+    """
+        Return the tags matching filter_text as HTML, joined by ``<br>``.
+
+        With FILTER_CSS, filter_text is a RegEx matched against class names, therefore any filter
+        with non-alphanumeric character must be escaped. With FILTER_TEXT it is a plain substring of the tag text,
+        and with FILTER_SELECTOR a real CSS selector such as ``table.prices td:nth-child(2)``.
+    """
+    return Result.from_tags(match_tags(soup, None, filter_text, filter_option)).html
+
+
+def match_tags(soup: BeautifulSoup, candidates, filter_text: str, filter_option: int, index=None, text_index=None) -> list:
+    """
+        Return the non-excluded tags matching filter_text, in document order.
+        If candidates is given, only those tags are considered instead of the whole soup.
+        An ElementIndex / TextIndex, if given, replaces the full-tree walk and the per-tag text rebuild.
+    """
+    if filter_option == FILTER_SELECTOR:
+        return select(soup, filter_text)
+
+    if filter_option == FILTER_CSS:
+        pattern = re.compile(filter_text)
+        if candidates is None:
+            candidates = index.classes(pattern) if index is not None else soup.find_all(class_=pattern)
+        else:
+            candidates = [tag for tag in candidates if _class_matches(tag, pattern)]
+        return [tag for tag in candidates if tag.name not in TAG_EXCLUDE]
+
+    elif text_index is not None:
+        return [tag for tag in text_index.containing(filter_text, candidates) if tag.name not in TAG_EXCLUDE]
+
+    else:
+        if candidates is None:
+            candidates = index.elements if index is not None else soup.find_all()
+        return [tag for tag in candidates if (tag.name not in TAG_EXCLUDE) and (filter_text in tag.text)]
+
+
+@lru_cache(maxsize=SELECTOR_CACHE_SIZE)
+def compile_selector(selector: str):
+    return soupsieve.compile(selector)
+
+
+def select(soup: BeautifulSoup, selector: str, limit: int = SELECT_LIMIT) -> list:
+    """
+        Return up to limit non-excluded tags matching the CSS selector, in document order.
+        Matching stops as soon as limit tags are found.
+    """
+    tags = []
+    for tag in compile_selector(selector).iselect(soup):
+        if tag.name not in TAG_EXCLUDE:
+            tags.append(tag)
+            if len(tags) >= limit:
+                break
+    return tags
+
+
+def _class_matches(tag, pattern) -> bool:
+    return _classes_match(tag.get('class'), pattern)
+
+
+def _classes_match(classes, pattern) -> bool:
+    # Same rule as find_all(class_=pattern): any single class, or the whole space-joined class list.
+    # While parsing, the class attribute is still the raw string.
+    if classes is None:
+        return False
+    if isinstance(classes, str):
+        classes = classes.split()
+    return any(pattern.search(c) for c in classes) or bool(pattern.search(' '.join(classes)))
+
+
+def outermost(tags, parents=lambda tag: tag.parents) -> list:
+    """
+        Drop every tag nested inside another tag of the list, keeping document order.
+    """
+    ids = {id(tag) for tag in tags}
+    return [tag for tag in tags if not any(id(parent) in ids for parent in parents(tag))]
+
+
+def estimate_soup_bytes(elements) -> int:
+    """
+        Approximate bytes held by the parse tree of the given elements, strings included.
+    """
+    size = 0
+    for tag in elements:
+        size += sys.getsizeof(tag) + sys.getsizeof(tag.__dict__) + sys.getsizeof(tag.contents) + sys.getsizeof(tag.attrs)
+        for child in tag.contents:
+            if not isinstance(child, Tag):
+                size += sys.getsizeof(child) + sys.getsizeof(child.__dict__)
+    return size
+
+
+class ElementIndex:
+    """
+        Lookup tables from class names, ids and tag names to elements, built in one pass over the soup.
+
+        A class RegEx is run against the distinct class vocabulary (usually a few hundred strings)
+        rather than against every element.
+    """
+    def __init__(self, soup: BeautifulSoup):
+        t0 = time.perf_counter()
+        self.elements = soup.find_all()  # Document order, positions below index into it
+        self.by_class = {}  # Single class name, and the space-joined class list, -> positions
+        self.by_id = {}
+        self.by_name = {}
+
+        for i, tag in enumerate(self.elements):
+            self.by_name.setdefault(tag.name, []).append(i)
+
+            tag_id = tag.get('id')
+            if tag_id:
+                self.by_id.setdefault(tag_id, []).append(i)
+
+            classes = tag.get('class')
+            if classes is not None:
+                if isinstance(classes, str):
+                    classes = classes.split()
+                for c in classes:
+                    self.by_class.setdefault(c, []).append(i)
+                # An empty class="" is only reachable through its joined form, ''
+                if len(classes) != 1:
+                    self.by_class.setdefault(' '.join(classes), []).append(i)
+
+        self.build_time = time.perf_counter() - t0
+
+    def classes(self, pattern) -> list:
+        """
+            Elements with a class (or whole class list) matching the compiled RegEx, in document order.
+        """
+        return self._collect(self.by_class, pattern)
+
+    def ids(self, pattern) -> list:
+        return self._collect(self.by_id, pattern)
+
+    def names(self, name: str) -> list:
+        return [self.elements[i] for i in self.by_name.get(name, [])]
+
+    def memory(self) -> int:
+        """
+            Approximate bytes held by the index itself, excluding the elements it points to.
+        """
+        size = sys.getsizeof(self.elements)
+        for table in (self.by_class, self.by_id, self.by_name):
+            size += sys.getsizeof(table)
+            size += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in table.items())
+        return size
+
+    def summary(self) -> str:
+        return f"Indexed {len(self.elements)} elements, {len(self.by_class)} classes " \
+               f"in {self.build_time * 1000:.1f} ms (~{self.memory() / 1024:.0f} KB)"
+
+    def _collect(self, table, pattern):
+        hits = set()
+        for key, positions in table.items():
+            if pattern.search(key):
+                hits.update(positions)
+        return [self.elements[i] for i in sorted(hits)]
+
+
+class TextIndex:
+    """
+        The text of the whole document concatenated into a single buffer, with the [start, end) span
+        each element's tag.text occupies in it.
+
+        A substring query finds every occurrence in the buffer once, then an element matches if an
+        occurrence fits inside its span, so no element text is ever rebuilt. The few elements whose text
+        is made of other string types (see TEXT_STRING_TYPES) are checked directly.
+    """
+    def __init__(self, elements: list):
+        t0 = time.perf_counter()
+        self.elements = elements
+        self.position = {id(tag): i for i, tag in enumerate(elements)}
+        self.starts = [0] * len(elements)
+        self.ends = [0] * len(elements)
+        self.special = set()
+
+        parts = []
+        offset = 0
+        roots = [tag for tag in elements if not isinstance(tag.parent, Tag) or id(tag.parent) not in self.position]
+        for root in roots:
+            # Iterative walk: (element, iterator over its children)
+            stack = [(root, iter(root.contents))]
+            self._enter(root, offset)
+            while stack:
+                tag, children = stack[-1]
+                child = next(children, None)
+                if child is None:
+                    stack.pop()
+                    self.ends[self.position[id(tag)]] = offset
+                elif isinstance(child, Tag):
+                    self._enter(child, offset)
+                    stack.append((child, iter(child.contents)))
+                elif type(child) in TEXT_STRING_TYPES:
+                    parts.append(child)
+                    offset += len(child)
+
+        self.buffer = ''.join(parts)
+        self.build_time = time.perf_counter() - t0
+
+    def _enter(self, tag, offset):
+        i = self.position[id(tag)]
+        self.starts[i] = offset
+        if tag.interesting_string_types != TEXT_STRING_TYPES:
+            self.special.add(i)
+
+    def containing(self, text: str, candidates=None) -> list:
+        """
+            Elements whose tag.text contains text, in document order, restricted to candidates if given.
+        """
+        if candidates is None:
+            positions = range(len(self.elements))
+        else:
+            positions = [self.position[id(tag)] for tag in candidates]
+
+        occurrences = []
+        i = self.buffer.find(text)
+        while i != -1:
+            occurrences.append(i)
+            i = self.buffer.find(text, i + 1)
+
+        found = []
+        for i in positions:
+            if i in self.special:
+                if text in self.elements[i].text:
+                    found.append(self.elements[i])
+                continue
+
+            j = bisect_left(occurrences, self.starts[i])
+            if j < len(occurrences) and occurrences[j] + len(text) <= self.ends[i]:
+                found.append(self.elements[i])
+        return found
+
+    def memory(self) -> int:
+        return sys.getsizeof(self.buffer) + sys.getsizeof(self.starts) + sys.getsizeof(self.ends) \
+            + sys.getsizeof(self.position) + sys.getsizeof(self.special)
+
+
+class Result:
+    """
+        Output of one extraction: the matched tags, their HTML and their text, plus the display views.
+
+        HTML and text are both taken from the original soup, so no view needs a re-parse,
+        and each view is computed once, making a switch between HTML / Clean / Raw a lookup.
+    """
+    def __init__(self, html, text, tags=None, pieces=None):
+        # html and text are either strings or zero-argument callables computing them on first use
+        self._html = html
+        self._text = text
+        # HTML view cut between whole elements, a list or a callable taking the piece size to aim for
+        self._pieces = pieces
+        self.tags = tags if tags is not None else []  # None once detached
+        self.query: tuple = None  # (filter_text, filter_option, collapse_nested) it answers, set by Document.result()
+        self._views = {}
+
+    @classmethod
+    def from_tags(cls, tags, serialize=str, text_of=lambda tag: tag.get_text(types=TEXT_STRING_TYPES)):
+        """
+            Result of a filter: matches whose markup repeats an earlier one are dropped.
+        """
+        unique = {}  # html -> tag, first occurrence wins
+        for tag in tags:
+            unique.setdefault(serialize(tag), tag)
+        html = '<br>\n'.join(unique)
+        return cls(html, lambda: '\n'.join(text_of(tag) for tag in unique.values()), list(unique.values()),
+                   match_pieces(list(unique)))
+
+    @classmethod
+    def from_document(cls, doc):
+        """
+            Result of an empty filter: the whole page, prettified, or a JSON body as it came.
+        """
+        if doc.is_json:
+            return cls(doc.text, doc.text)
+        return cls(lambda: doc.prettified, doc.page_text, pieces=doc.prettified_pieces)
+
+    @classmethod
+    def from_error(cls, e: BaseException):
+        return cls(repr(e), repr(e))
+
+    @property
+    def html(self) -> str:
+        if callable(self._html):
+            self._html = self._html()
+        return self._html
+
+    @property
+    def text(self) -> str:
+        if callable(self._text):
+            self._text = self._text()
+        return self._text
+
+    def view(self, output_option: int) -> str:
+        """
+            Display string for an output option: 0 (HTML) and 2 (Raw) keep the markup,
+            1 (Clean) keeps the text only, one run of words per line.
+        """
+        if output_option not in self._views:
+            self._views[output_option] = CLEAN_RE.sub('\n', self.text) if output_option == 1 else self.html
+        return self._views[output_option]
+
+    def html_pieces(self, max_chars: int) -> list:
+        """
+            The HTML view cut between whole elements into pieces of about max_chars, to be laid out one after
+            the other: one piece per match, or for the whole page, per element of its body.
+        """
+        if callable(self._pieces):
+            self._pieces = self._pieces(max_chars)
+        return self._pieces if self._pieces is not None else [self.html]
+
+    def detach(self):
+        """
+            Let go of the matched tags, whose .parent links keep their whole tree alive, computing the text
+            from them first. A detached Result still gives every view; its tags are None, run query again for them.
+        """
+        if self.tags:
+            _ = self.text
+        self.tags = None
+
+    def memory(self) -> int:
+        strings = [v for v in (self._html, self._text) if isinstance(v, str)] + list(self._views.values())
+        return sum(sys.getsizeof(v) for v in strings)
+
+
+def _is_big(elements, max_chars: int) -> bool:
+    # Whether a subtree surely prettifies to over max_chars, told from its elements without serializing it
+    limit = max_chars // MIN_ELEMENT_CHARS
+    for count, _ in enumerate(elements):
+        if count >= limit:
+            return True
+    return False
+
+
+def match_pieces(htmls: list) -> list:
+    """
+        Pieces of the HTML view of matches joined by <br>, one per match.
+    """
+    return [html + '<br>\n' for html in htmls[:-1]] + htmls[-1:]
+
+
+class Document:
+    """
+        One fetched page: its text, its soup and a memo of recent queries against it.
+
+        Queries are memoized per (filter, option), so revisiting a filter (e.g. on backspace) is free.
+        A filter that refines a memoized one only searches that query's matches:
+        in Text mode when it extends the old substring, in CSS mode when both are plain literals.
+        Each element is serialized at most once per document, however many queries it matches.
+
+        The prettified page is only built when asked for. release() drops the soup and every derived
+        structure and keeps the text zlib-compressed; the soup is rebuilt on the next access.
+
+        A JSON document, as told by its Content-Type, is not parsed into a soup unless it is filtered.
+
+        Given a target (filter_text, filter_option) that strainer_for() compiles, only the subtrees that
+        can match it are built. With the 'lxml' backend the page is first parsed by libxml2 alone and only
+        those subtrees go through BeautifulSoup, so a selective filter parses several times faster;
+        html.parser still reads the whole page in Python, saving memory only. Such a partial document
+        answers that filter as the full one would; any other query first parses the whole page.
+    """
+    def __init__(self, text: str, url: str = None, content_type: str = None, target: tuple = None,
+                 parser: str = PARSER_LXML):
+        self.url = url
+        self.content_type = content_type or ''
+        self.parser = parser
+        self._strainer = strainer_for(*target) if target is not None else None
+        self._target = target if self._strainer is not None else None
+        self._text = text
+        self._compressed = None
+        self._soup = None
+        self._soup_bytes = 0
+        self._index = None
+        self._text_index = None
+        self._prettified = None
+        self._full_result = None
+        self._queries = OrderedDict()  # (filter_text, filter_option) -> (tags, {collapse_nested: Result})
+        self._html = {}  # id(tag) -> str(tag)
+        self._handed = weakref.WeakSet()  # Results of filters handed out, detached when the soup goes
+        self.parse_time = 0.0  # Seconds the last parse took, index included
+        if not self.is_json:
+            self._parse()  # Eagerly, a fresh document is about to be displayed
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            return zlib.decompress(self._compressed).decode('utf-8')
+        return self._text
+
+    @property
+    def soup(self) -> BeautifulSoup:
+        if self._soup is None:
+            self._parse()
+        return self._soup
+
+    @property
+    def index(self) -> ElementIndex:
+        if self._soup is None:
+            self._parse()
+        return self._index
+
+    @property
+    def prettified(self) -> str:
+        self.parse_all()
+        if self._prettified is None:
+            self._prettified = self.soup.prettify()
+        return self._prettified
+
+    def prettified_pieces(self, max_chars: int) -> list:
+        """
+            The page prettified piece by piece, each piece holding whole elements: the children of <body>,
+            a plain container (SPLIT_TAGS) over max_chars being cut into its own children in turn.
+        """
+        self.parse_all()
+        pieces = []
+        body = self.soup.body
+        self._cut(body if body is not None else self.soup, max_chars, pieces)
+        return pieces
+
+    def _cut(self, tag, max_chars, pieces):
+        for child in tag.children:
+            if not isinstance(child, Tag):
+                html = child.output_ready().strip()
+                if html:
+                    pieces.append(html + '\n')
+                continue
+            split = child.name in SPLIT_TAGS
+            if split and _is_big((node for node in child.descendants if isinstance(node, Tag)), max_chars):
+                self._cut(child, max_chars, pieces)
+                continue
+            html = child.prettify()
+            if split and len(html) > max_chars:
+                self._cut(child, max_chars, pieces)
+            else:
+                pieces.append(html)
+
+    @property
+    def is_released(self) -> bool:
+        return self._text is None
+
+    @property
+    def is_partial(self) -> bool:
+        return self._target is not None
+
+    @property
+    def is_json(self) -> bool:
+        return 'json' in self.content_type.split(';')[0].lower()
+
+    @property
+    def content(self) -> bytes:
+        """
+            The response body, encoded back with its charset; as requests does, text/* defaults to ISO-8859-1.
+        """
+        charset = CHARSET_RE.search(self.content_type)
+        if charset is not None:
+            encoding = charset.group(1)
+        else:
+            encoding = 'ISO-8859-1' if self.content_type.lower().startswith('text/') else 'utf-8'
+        try:
+            return self.text.encode(encoding, errors='replace')
+        except LookupError:
+            return self.text.encode('utf-8')
+
+    def summary(self) -> str:
+        if self.is_json and self._soup is None:
+            return f"JSON, {len(self.text)} characters, not parsed"
+        if self._target is not None:
+            return f"{self.index.summary()} (targeted parse)"
+        return self.index.summary()
+
+    @property
+    def node_count(self) -> int:
+        return len(self._index.elements) if self._index is not None else 0
+
+    def _parse(self):
+        t0 = time.perf_counter()
+        self._text = self.text
+        self._compressed = None
+        text = self._text
+        if self._strainer is not None and self.parser == PARSER_LXML:
+            text = target_markup(text, *self._target)
+        self._soup = parse(text, self._strainer, self.parser)
+        self._index = ElementIndex(self._soup)
+        self._soup_bytes = estimate_soup_bytes(self._index.elements)
+        self.parse_time = time.perf_counter() - t0
+
+    def release(self):
+        """
+            Drop the soup, indexes, memoized queries and prettified page, keeping only the compressed text.
+            Results of filters handed out are detached, their tags would otherwise keep the soup alive.
+        """
+        if self._text is not None:
+            self._compressed = zlib.compress(self._text.encode('utf-8'), 6)
+            self._text = None
+        self._drop_soup()
+
+    def parse_all(self):
+        """
+            Turn a partial document into a full one, parsing the whole page.
+        """
+        if self._target is None:
+            return
+        self._target = None
+        self._strainer = None
+        self._drop_soup()
+        if not self.is_json:
+            self._parse()
+
+    def _drop_soup(self):
+        # Results held by widgets would keep the soup alive through their tags
+        for result in list(self._handed):
+            result.detach()
+        self._handed.clear()
+        self._soup = None
+        self._soup_bytes = 0
+        self._index = None
+        self._text_index = None
+        self._prettified = None
+        self._full_result = None
+        self._queries.clear()
+        self._html.clear()
+
+    def memory(self) -> int:
+        """
+            Approximate bytes held by this document: text, soup, indexes and cached output.
+        """
+        size = sys.getsizeof(self._text) if self._text is not None else sys.getsizeof(self._compressed)
+        size += self._soup_bytes
+        if self._index is not None:
+            size += self._index.memory()
+        if self._text_index is not None:
+            size += self._text_index.memory()
+        if self._prettified is not None:
+            size += sys.getsizeof(self._prettified)
+        size += sum(sys.getsizeof(html) for html in self._html.values())
+        size += sum(result.memory() for _, cached in self._queries.values() for result in cached.values())
+        if self._full_result is not None:
+            size += self._full_result.memory()
+        return size
+
+    def query(self, filter_text: str, filter_option: int, collapse_nested: bool = False) -> str:
+        """
+            Return the extracted HTML for a non-empty filter, as extract() would.
+        """
+        return self.result(filter_text, filter_option, collapse_nested).html
+
+    def result(self, filter_text: str, filter_option: int, collapse_nested: bool = False) -> Result:
+        """
+            Return the Result for filter_text, or for the whole page if it is empty.
+            With collapse_nested, matches inside another match are left out.
+        """
+        if self._target is not None and self._target != (filter_text, filter_option):
+            self.parse_all()
+
+        if not filter_text:
+            if self._full_result is None:
+                self._full_result = Result.from_document(self)
+            return self._full_result
+
+        tags, results = self._query(filter_text, filter_option)
+        if collapse_nested not in results:
+            result = results[collapse_nested] = Result.from_tags(
+                outermost(tags, self.parents) if collapse_nested else tags, self.serialize, self.text_of)
+            result.query = (filter_text, filter_option, collapse_nested)
+            self._handed.add(result)
+        return results[collapse_nested]
+
+    def serialize(self, tag) -> str:
+        html = self._html.get(id(tag))
+        if html is None:
+            html = self._html[id(tag)] = str(tag)
+        return html
+
+    # Tree access that differs between the BeautifulSoup and lxml backends
+    @staticmethod
+    def text_of(tag) -> str:
+        return tag.get_text(types=TEXT_STRING_TYPES)
+
+    @staticmethod
+    def parents(tag):
+        return tag.parents
+
+    def page_text(self) -> str:
+        return self.soup.get_text('\n', types=TEXT_STRING_TYPES)
+
+    def records(self, tags) -> list:
+        return tag_records(tags, self.serialize, self.text_of)
+
+    @staticmethod
+    def links(tags) -> list:
+        """
+            href of each tag that has one, else of the anchors inside it, in document order.
+        """
+        hrefs = []
+        for tag in tags:
+            if tag.get('href'):
+                hrefs.append(tag['href'])
+            else:
+                hrefs += [a['href'] for a in tag.find_all('a', href=True)]
+        return hrefs
+
+    def matches(self, filter_text: str, filter_option: int) -> list:
+        return self._query(filter_text, filter_option)[0]
+
+    @property
+    def text_index(self) -> TextIndex:
+        # Built on the first Text mode query, boxes filtering by CSS never pay for it
+        if self._text_index is None:
+            self._text_index = TextIndex(self.index.elements)
+        return self._text_index
+
+    def _query(self, filter_text, filter_option):
+        key = (filter_text, filter_option)
+        if key in self._queries:
+            self._queries.move_to_end(key)
+            return self._queries[key]
+
+        tags = self._match(filter_text, filter_option, self._narrowest(filter_text, filter_option))
+        self._queries[key] = (tags, {})
+        if len(self._queries) > QUERY_CACHE_SIZE:
+            self._queries.popitem(last=False)
+        return self._queries[key]
+
+    def _match(self, filter_text, filter_option, candidates):
+        text_index = self.text_index if filter_option == FILTER_TEXT else None
+        return match_tags(self.soup, candidates, filter_text, filter_option, self.index, text_index)
+
+    def _narrowest(self, filter_text, filter_option):
+        # Smallest memoized match set guaranteed to contain every match of filter_text, None if there is none
+        if filter_option == FILTER_SELECTOR:
+            return None
+        is_with_css = filter_option == FILTER_CSS
+        if is_with_css and re.escape(filter_text) != filter_text:
+            return None
+
+        best = None
+        for (prev_text, prev_option), (tags, _) in self._queries.items():
+            if prev_option != filter_option or not prev_text or prev_text not in filter_text:
+                continue
+            if is_with_css and re.escape(prev_text) != prev_text:
+                continue
+            if best is None or len(tags) < len(best):
+                best = tags
+        return best
+
+
+class LxmlDocument(Document):
+    """
+        A Document over a raw lxml.html tree, queried with XPath rather than through BeautifulSoup.
+
+        Same libxml2 parse as the 'lxml' backend without building the Python-side soup on top of it,
+        which makes it the fastest backend to parse and to query. Text matches follow BeautifulSoup's
+        get_text() rules, so both backends extract the same text; the markup is serialized by lxml,
+        e.g. void tags come out as <br> rather than <br/>. Selector mode needs cssselect.
+
+        The whole page is always parsed, a target is ignored: this parse is already the C one a targeted
+        'lxml' parse starts with, and XPath queries the full tree about as fast as a partial one.
+    """
+    _containing_xpath = etree.XPath("//*[contains(string(.), $text)]")
+    _with_class_xpath = etree.XPath("//*[@class]")
+
+    def __init__(self, text: str, url: str = None, content_type: str = None):
+        super().__init__(text, url, content_type, parser=PARSER_LXML_HTML)
+
+    @property
+    def prettified(self) -> str:
+        if self._prettified is None:
+            self._prettified = lxml.html.tostring(self.soup, encoding='unicode', pretty_print=True)
+        return self._prettified
+
+    def summary(self) -> str:
+        if self.is_json and self._soup is None:
+            return f"JSON, {len(self.text)} characters, not parsed"
+        return f"Parsed {self.node_count} elements with lxml.html"
+
+    def _cut(self, tag, max_chars, pieces):
+        # Text of an lxml element sits on it and on the tail of the child before, not in child nodes
+        if tag.text and tag.text.strip():
+            pieces.append(escape(tag.text.strip()) + '\n')
+        for child in tag:
+            split = child.tag in SPLIT_TAGS
+            if split and _is_big(child.iterdescendants(), max_chars):
+                self._cut(child, max_chars, pieces)
+            else:
+                html = lxml.html.tostring(child, encoding='unicode', pretty_print=True, with_tail=False)
+                if split and len(html) > max_chars:
+                    self._cut(child, max_chars, pieces)
+                else:
+                    pieces.append(html)
+            if child.tail and child.tail.strip():
+                pieces.append(escape(child.tail.strip()) + '\n')
+
+    @property
+    def node_count(self) -> int:
+        return self._soup_bytes // LXML_ELEMENT_BYTES
+
+    def _parse(self):
+        t0 = time.perf_counter()
+        self._text = self.text
+        self._compressed = None
+        try:
+            self._soup = lxml.html.document_fromstring(self._text.encode('utf-8'), lxml.html.HTMLParser(encoding='utf-8'))
+        except etree.ParserError:  # Nothing but whitespace
+            self._soup = lxml.html.document_fromstring('<html></html>')
+        self._soup_bytes = sum(1 for _ in self._soup.iter()) * LXML_ELEMENT_BYTES
+        self.parse_time = time.perf_counter() - t0
+
+    def serialize(self, tag) -> str:
+        # Keyed by the element itself, lxml proxies may be recreated at the same id() once dropped
+        html = self._html.get(tag)
+        if html is None:
+            html = self._html[tag] = lxml.html.tostring(tag, encoding='unicode', with_tail=False)
+        return html
+
+    @staticmethod
+    def text_of(tag) -> str:
+        if tag.tag in OWN_TEXT_TAGS or any(parent.tag in OWN_TEXT_TAGS for parent in tag.iterancestors()):
+            return ''
+        strings = []
+        _lxml_strings(tag, strings)
+        return ''.join(strings)
+
+    @classmethod
+    def _tag_text(cls, tag) -> str:
+        # tag.text, which Text mode matches against: as text_of(), but a <style> or <script> has its own text
+        if tag.tag in OWN_TEXT_TAGS:
+            return tag.text_content()
+        return cls.text_of(tag)
+
+    @staticmethod
+    def parents(tag):
+        return tag.iterancestors()
+
+    def page_text(self) -> str:
+        strings = []
+        _lxml_strings(self.soup, strings)
+        return '\n'.join(strings)
+
+    def records(self, tags) -> list:
+        return [dict(name=tag.tag, attrs=dict(tag.attrib), text=self.text_of(tag), html=self.serialize(tag))
+                for tag in tags]
+
+    @staticmethod
+    def links(tags) -> list:
+        hrefs = []
+        for tag in tags:
+            if tag.get('href'):
+                hrefs.append(tag.get('href'))
+            else:
+                hrefs += [a.get('href') for a in tag.iterdescendants('a') if a.get('href')]
+        return hrefs
+
+    def _match(self, filter_text, filter_option, candidates):
+        if filter_option == FILTER_SELECTOR:
+            if CSSSelector is None:
+                raise ImportError("Selector mode with the lxml.html parser needs cssselect, pip install cssselect")
+            tags = (tag for tag in compile_lxml_selector(filter_text)(self.soup) if tag.tag not in TAG_EXCLUDE)
+            return [tag for tag, _ in zip(tags, range(SELECT_LIMIT))]
+
+        if filter_option == FILTER_CSS:
+            pattern = re.compile(filter_text)
+            if candidates is None:
+                candidates = self._with_class_xpath(self.soup)
+            return [tag for tag in candidates if tag.tag not in TAG_EXCLUDE and _classes_match(tag.get('class'), pattern)]
+
+        # string(.) also holds script and style text, so XPath only narrows the candidates down
+        if candidates is None:
+            candidates = self._containing_xpath(self.soup, text=filter_text)
+        return [tag for tag in candidates if tag.tag not in TAG_EXCLUDE and filter_text in self._tag_text(tag)]
+
+
+def _lxml_strings(element, strings: list):
+    # Text and tails in document order, skipping comments and the subtrees of OWN_TEXT_TAGS.
+    # Recursive, libxml2 caps HTML nesting at 256 levels.
+    if element.text and isinstance(element.tag, str):
+        strings.append(element.text)
+    for child in element:
+        if isinstance(child.tag, str) and child.tag not in OWN_TEXT_TAGS:
+            _lxml_strings(child, strings)
+        if child.tail:
+            strings.append(child.tail)
+
+
+@lru_cache(maxsize=SELECTOR_CACHE_SIZE)
+def compile_lxml_selector(selector: str):
+    return CSSSelector(selector, translator="html")
+
+
+def transform_namespace() -> dict:
+    """
+        Globals visible to user transforms. pandas and numpy are offered when installed.
+    """
+    namespace = dict(json=json, re=re, BeautifulSoup=BeautifulSoup)
+    try:
+        import pandas as pd
+        import numpy as np
+        namespace.update(pd=pd, np=np)
+    except ImportError:
+        pass
+    return namespace
+
+
+def check_transform(fn: str, name: str = '_F'):
+    """
+        Check the source of a ``def f(x): ... return ...`` transform and return its code, defining the function
+        under name. Nothing is imported or run, so this is cheap enough for the GUI thread.
+    """
+    fn = fn.strip()
+    if not fn.startswith('def') or 'return' not in fn:
+        raise ValueError(TRANSFORM_ERR_MSG)
+
+    fn_args = fn[fn.index("(")+1:fn.index(")")]
+    fn_body = fn[fn.index('\n')+1:]
+    fn_reconstructed = f"def {name}({fn_args}):\n{fn_body}"
+    return compile(fn_reconstructed, f'<transform {name}>', 'exec')
+
+
+def compile_transform(fn: str, name: str = '_F'):
+    """
+        Compile the source of a ``def f(x): ... return ...`` transform and return the function.
+        The function name is mangled to name so several transforms can live side by side.
+        Its globals come from transform_namespace(), which imports pandas: call it where transforms run.
+    """
+    namespace = transform_namespace()
+    exec(check_transform(fn, name), namespace)
+    return namespace[name]
+
+
+def tag_records(tags, serialize=str, text_of=Document.text_of) -> list:
+    """
+        Plain dicts describing tags, which unlike the tags themselves can be sent to another process.
+    """
+    return [dict(name=tag.name, attrs=dict(tag.attrs), text=text_of(tag), html=serialize(tag)) for tag in tags]
+
+
+def transform_payload(doc: Document, result: Result, input_option: int, output_option: int = 0):
+    """
+        Picklable data the x of a transform is built from. JSON is sent as its text and only parsed where the
+        transform runs. INPUT_TEXT is the text of the matches for the HTML option, else the view as displayed,
+        taken from the Result so that the app and headless.py feed a transform the same text.
+        Without a doc, e.g. for the merged pages of a crawl, only INPUT_TEXT is available.
+    """
+    if doc is None and input_option != INPUT_TEXT:
+        raise ValueError(f"The {TRANSFORM_INPUTS[input_option]} input needs a single page, use Text")
+    if input_option == INPUT_BYTES:
+        return doc.content
+    if input_option == INPUT_JSON:
+        return doc.text
+    if input_option == INPUT_TAGS:
+        return doc.records(_tags(doc, result))
+    if input_option == INPUT_FRAME:
+        return doc.text if doc.is_json else doc.records(_tags(doc, result))
+    return result.text if output_option == 0 else result.view(output_option)
+
+
+def _tags(doc: Document, result: Result) -> list:
+    # A Result detached by a release has its query run again, parsing the page again
+    return result.tags if result.tags is not None else doc.result(*result.query).tags
+
+
+def transform_argument(payload, input_option: int):
+    """
+        Build the x of a transform from transform_payload(), in the process running the transform.
+    """
+    if input_option == INPUT_JSON:
+        return json.loads(payload)
+    if input_option == INPUT_FRAME:
+        import pandas as pd
+        if isinstance(payload, str):
+            return pd.json_normalize(json.loads(payload))
+        return pd.DataFrame(payload)
+    return payload
+
+
+def filter_option_from_config(cfg: dict) -> int:
+    # Configs saved before selector mode only carry is_with_css
+    return cfg.get('filter_option', FILTER_CSS if cfg.get('is_with_css', True) else FILTER_TEXT)
+
+
+def run_config(cfg: dict, text: str, content_type: str = None, targeted: bool = True) -> str:
+    """
+        Run one saved EntityBox config against fetched text: parse, extract, render and transform.
+        Errors in extraction or transform are returned as their repr, as the app displays them.
+        With targeted, only the parts of the page the filter can match are built, where the filter allows.
+    """
+    target = (cfg.get('filter', ''), filter_option_from_config(cfg)) if targeted else None
+    doc = make_document(text, cfg.get('url'), content_type, target, cfg.get('parser', PARSER_LXML))
+
+    try:
+        result = doc.result(cfg.get('filter', ''), filter_option_from_config(cfg), cfg.get('collapse_nested', False))
+    except BaseException as e:
+        result = Result.from_error(e)
+
+    return config_output(cfg, result, doc)
+
+
+def config_output(cfg: dict, result: Result, doc: Document = None) -> str:
+    """
+        Render result with the output option of a saved config, then apply its transform if enabled.
+    """
+    output_option = cfg.get('output_option', 0)
+    output = result.view(output_option)
+
+    if cfg.get('is_with_transform') and cfg.get('transform'):
+        try:
+            input_option = cfg.get('transform_input', INPUT_TEXT)
+            x = transform_argument(transform_payload(doc, result, input_option, output_option), input_option)
+            output = str(compile_transform(cfg['transform'])(x))
+        except BaseException as e:
+            output = repr(e)
+
+    return output
@@ -0,0 +1,123 @@
+import os
+import sys
+import json
+import argparse
+import multiprocessing
+import concurrent.futures
+
+import engine
+import crawl
+from aio import get_engine, BatchStats
+from history import HistoryStore, widget_key
+
+
+def load_jobs(paths) -> list[tuple[str, str, dict]]:
+    """
+        Read config files in the format written by MainWindow.save_config().
+        Return one (config path, widget key, widget config) tuple per saved widget.
+    """
+    jobs = []
+    for path in paths:
+        with open(path, 'r') as f:
+            cfg = json.load(f)
+        for key in cfg:
+            jobs.append((path, key, cfg[key]))
+    return jobs
+
+
+def emit(job, url, output, error, out_dir):
+    """
+        Write one result, either as a JSON line on stdout or as a text file under out_dir.
+    """
+    path, key, _ = job
+    if out_dir is None:
+        sys.stdout.write(json.dumps(dict(config=path, key=key, url=url, output=output, error=error)) + '\n')
+        sys.stdout.flush()
+        return
+
+    stem = os.path.splitext(os.path.basename(path))[0]
+    with open(os.path.join(out_dir, f"{stem}_{key}.txt"), 'w', encoding='utf-8') as f:
+        f.write(output if error is None else error)
+
+
+def run(paths, out_dir=None, processes=None, history: HistoryStore = None, targeted=True) -> BatchStats:
+    """
+        Fetch every widget URL concurrently, then parse, extract and transform in a process pool.
+        Each distinct URL is fetched once however many widgets point at it.
+        Successful outputs are also recorded to history, if given.
+        With targeted, each widget only builds the tree its filter can match, where the filter allows;
+        with the default lxml parser, the rest of the page never reaches BeautifulSoup.
+        Widgets in crawl mode are crawled once the others are done, one crawl at a time.
+    """
+    jobs = load_jobs(paths)
+    crawl_jobs = [job for job in jobs if job[2].get('crawl')]
+    by_url = {}
+    for job in jobs:
+        if not job[2].get('crawl'):
+            by_url.setdefault(job[2].get('url', ''), []).append(job)
+
+    if out_dir is not None:
+        os.makedirs(out_dir, exist_ok=True)
+
+    stats = BatchStats()
+    # spawn: the FetchEngine threads are already running, and a forked child would inherit their locks mid-use
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes,
+                                                mp_context=multiprocessing.get_context('spawn')) as pool:
+        pending = {}
+        for url, result, error in get_engine().fetch_many(by_url, stats):
+            for job in by_url[url]:
+                if error is not None or not result.ok:
+                    emit(job, url, None, repr(error if error is not None else result), out_dir)
+                    continue
+                pending[pool.submit(engine.run_config, job[2], result.text,
+                                     result.headers.get('Content-Type'), targeted)] = (job, url)
+
+        for future in concurrent.futures.as_completed(pending):
+            job, url = pending[future]
+            try:
+                output = future.result()
+            except Exception as e:
+                emit(job, url, None, repr(e), out_dir)
+                continue
+            emit(job, url, output, None, out_dir)
+            if history is not None:
+                history.record(widget_key(job[2]), url, output)
+
+    for job in crawl_jobs:
+        url = job[2].get('url', '')
+        try:
+            output = crawl.run_config(job[2], stats)
+        except Exception as e:
+            emit(job, url, None, repr(e), out_dir)
+            continue
+        emit(job, url, output, None, out_dir)
+        if history is not None:
+            history.record(widget_key(job[2]), url, output)
+
+    stats.finish()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run saved bs-viz configs without the GUI.")
+    parser.add_argument('configs', nargs='*', default=['./config.json'], help="config files written by Save Config")
+    parser.add_argument('-o', '--out-dir', default=None, help="write one text file per widget instead of JSON lines on stdout")
+    parser.add_argument('-j', '--processes', type=int, default=None, help="parser processes, defaults to the CPU count")
+    parser.add_argument('--history', default=None, metavar='DB', help="also record outputs to this history file")
+    parser.add_argument('--max-body-mb', type=float, default=None, help="abandon responses larger than this")
+    parser.add_argument('--full-parse', action='store_true', help="parse whole pages, even for filters that need less")
+    args = parser.parse_args()
+
+    if args.max_body_mb is not None:
+        get_engine().max_bytes = int(args.max_body_mb * 1024 * 1024)
+
+    history = HistoryStore(args.history) if args.history else None
+    stats = run(args.configs, args.out_dir, args.processes, history, not args.full_parse)
+    print(stats.summary(), file=sys.stderr)
+    if history is not None:
+        print(history.summary(), file=sys.stderr)
+        history.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+import sys
+import time
+import zlib
+import sqlite3
+import hashlib
+import argparse
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+HISTORY_DB = "./bs-viz-history.sqlite3"
+
+# Blob codecs, stored with each blob so a history written with zstd stays readable without it and vice versa
+CODEC_ZLIB = 0
+CODEC_ZSTD = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    codec INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    widget TEXT NOT NULL,
+    ts REAL NOT NULL,
+    url TEXT,
+    hash TEXT NOT NULL REFERENCES blobs(hash)
+);
+CREATE INDEX IF NOT EXISTS snapshots_widget_ts ON snapshots (widget, ts);
+"""
+
+
+def widget_key(cfg: dict) -> str:
+    """
+        Name a widget's history after what it watches, so it carries over between sessions and configs.
+    """
+    return f"{cfg.get('url', '')} | {cfg.get('filter', '')}"
+
+
+class HistoryStore:
+    """
+        Time series of widget outputs in an SQLite file.
+
+        Each output is stored once per distinct content, compressed with zstd when installed, else zlib;
+        a snapshot is a (widget, time, url, content hash) row, so an unchanged refresh costs one small row.
+        Snapshots are indexed by (widget, time) for range queries.
+    """
+    def __init__(self, path=HISTORY_DB):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def record(self, widget: str, url: str, output: str, ts: float = None) -> bool:
+        """
+            Append a snapshot of output for widget. Return True if its content was not stored before.
+        """
+        data = output.encode('utf-8')
+        digest = hashlib.sha1(data).hexdigest()
+        with self.conn:
+            is_new = self.conn.execute("SELECT 1 FROM blobs WHERE hash = ?", (digest,)).fetchone() is None
+            if is_new:
+                codec, blob = compress(data)
+                self.conn.execute("INSERT INTO blobs VALUES (?, ?, ?, ?)", (digest, codec, len(data), blob))
+            self.conn.execute("INSERT INTO snapshots VALUES (?, ?, ?, ?)",
+                              (widget, time.time() if ts is None else ts, url, digest))
+        return is_new
+
+    def snapshots(self, widget: str, start: float = None, end: float = None) -> list[tuple[float, str, str]]:
+        """
+            Return the (ts, url, output) snapshots of widget with start <= ts < end, oldest first.
+        """
+        return [(ts, url, output) for _, ts, url, _, output in self._read(widget, start, end)]
+
+    def latest(self, widget: str) -> tuple[float, str, str]:
+        row = self.conn.execute("SELECT ts, url, hash FROM snapshots WHERE widget = ? ORDER BY ts DESC LIMIT 1",
+                                (widget,)).fetchone()
+        if row is None:
+            return None
+        return row[0], row[1], self._load(row[2])
+
+    def widgets(self) -> list[str]:
+        return [row[0] for row in self.conn.execute("SELECT DISTINCT widget FROM snapshots ORDER BY widget")]
+
+    def to_dataframe(self, widget: str = None, start: float = None, end: float = None):
+        """
+            Return snapshots as a pandas DataFrame with columns widget, time, url, hash, output,
+            read in one query; each distinct content is decompressed once.
+        """
+        import pandas as pd
+
+        df = pd.DataFrame(self._read(widget, start, end), columns=['widget', 'ts', 'url', 'hash', 'output'])
+        df['time'] = pd.to_datetime(df.pop('ts'), unit='s')
+        return df[['widget', 'time', 'url', 'hash', 'output']]
+
+    def to_parquet(self, path: str, widget: str = None, start: float = None, end: float = None):
+        self.to_dataframe(widget, start, end).to_parquet(path, index=False)
+
+    def summary(self) -> str:
+        snapshots, = self.conn.execute("SELECT COUNT(*) FROM snapshots").fetchone()
+        blobs, size, stored = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(LENGTH(data)), 0) FROM blobs").fetchone()
+        return (f"History: {snapshots} snapshots of {len(self.widgets())} widgets, {blobs} distinct outputs, "
+                f"{size / 1024:.0f} KB stored in {stored / 1024:.0f} KB")
+
+    def close(self):
+        self.conn.close()
+
+    def _read(self, widget, start, end) -> list:
+        query = "SELECT s.widget, s.ts, s.url, s.hash, b.codec, b.data FROM snapshots s JOIN blobs b ON b.hash = s.hash"
+        clauses, params = [], []
+        if widget is not None:
+            clauses.append("s.widget = ?")
+            params.append(widget)
+        if start is not None:
+            clauses.append("s.ts >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("s.ts < ?")
+            params.append(end)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY s.widget, s.ts"
+
+        outputs = {}  # hash -> output
+        rows = []
+        for widget_, ts, url, digest, codec, data in self.conn.execute(query, params):
+            if digest not in outputs:
+                outputs[digest] = decompress(codec, data).decode('utf-8')
+            rows.append((widget_, ts, url, digest, outputs[digest]))
+        return rows
+
+    def _load(self, digest) -> str:
+        codec, data = self.conn.execute("SELECT codec, data FROM blobs WHERE hash = ?", (digest,)).fetchone()
+        return decompress(codec, data).decode('utf-8')
+
+
+def compress(data: bytes) -> tuple[int, bytes]:
+    if zstandard is not None:
+        return CODEC_ZSTD, zstandard.ZstdCompressor(level=10).compress(data)
+    return CODEC_ZLIB, zlib.compress(data, 9)
+
+
+def decompress(codec: int, data: bytes) -> bytes:
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ImportError("This history was written with zstd, install zstandard to read it.")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or export a bs-viz history.")
+    parser.add_argument('db', nargs='?', default=HISTORY_DB, help="history file written by the app or headless.py")
+    parser.add_argument('-w', '--widget', default=None, help="only this widget, as listed without -o")
+    parser.add_argument('-o', '--out', default=None, help="export to this .parquet or .csv file")
+    args = parser.parse_args()
+
+    store = HistoryStore(args.db)
+    if args.out is None:
+        for widget in store.widgets():
+            print(widget)
+    elif args.out.endswith('.csv'):
+        store.to_dataframe(args.widget).to_csv(args.out, index=False)
+    else:
+        store.to_parquet(args.out, args.widget)
+    print(store.summary(), file=sys.stderr)
+    store.close()
+
+
+if __name__ == '__main__':
+    main()
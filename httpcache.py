@@ -0,0 +1,136 @@
+import os
+import json
+import time
+import zlib
+import hashlib
+import threading
+
+CACHE_DIR = "./.bs-viz-cache"
+MAX_CACHE_BYTES = 256 * 1024 * 1024  # Compressed bytes kept on disk before LRU eviction kicks in
+INDEX_FILE = "index.json"
+
+
+class HttpCache:
+    """
+        Persistent HTTP response cache keyed by URL, used for conditional requests.
+
+        Only 200 responses carrying an ETag or Last-Modified validator are stored. Bodies are kept
+        zlib-compressed, one file per URL, with a JSON index holding validators and LRU timestamps.
+    """
+    def __init__(self, path=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+        self._lock = threading.Lock()
+        self._index = self._load_index()
+
+    @staticmethod
+    def key(url) -> str:
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+    def conditional_headers(self, url) -> dict:
+        """
+            Return the If-None-Match / If-Modified-Since headers for url, empty if it is not cached.
+        """
+        with self._lock:
+            entry = self._index.get(self.key(url))
+
+        headers = {}
+        if entry is None or not os.path.exists(os.path.join(self.path, self.key(url))):
+            return headers
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def hit(self, url) -> dict:
+        """
+            Record a 304 for url, refresh its LRU position and return its index entry.
+        """
+        with self._lock:
+            entry = self._index.get(self.key(url))
+            if entry is None:
+                return None
+            entry['last_used'] = time.time()
+            self.hits += 1
+            self.bytes_saved += entry['raw_size']
+            self._save_index()
+            return entry
+
+    def miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def load(self, url) -> str:
+        """
+            Read and decompress the cached body for url.
+        """
+        with open(os.path.join(self.path, self.key(url)), 'rb') as f:
+            return zlib.decompress(f.read()).decode('utf-8')
+
+    def store(self, url, text: str, headers):
+        """
+            Store a 200 response body if it carries a validator, then evict down to max_bytes.
+        """
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return
+
+        raw = text.encode('utf-8')
+        body = zlib.compress(raw, 6)
+        key = self.key(url)
+
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            with open(os.path.join(self.path, key), 'wb') as f:
+                f.write(body)
+
+            self._index[key] = dict(
+                url=url,
+                etag=etag,
+                last_modified=last_modified,
+                content_type=headers.get('Content-Type', ''),
+                size=len(body),
+                raw_size=len(raw),
+                last_used=time.time(),
+            )
+            self._evict()
+            self._save_index()
+
+    def size(self) -> int:
+        with self._lock:
+            return sum(entry['size'] for entry in self._index.values())
+
+    def summary(self) -> str:
+        return f"Cache: {self.hits} hit / {self.misses} miss, {self.bytes_saved / 1024 / 1024:.1f} MB saved"
+
+    def _evict(self):
+        total = sum(entry['size'] for entry in self._index.values())
+        for key, entry in sorted(self._index.items(), key=lambda kv: kv[1]['last_used']):
+            if total <= self.max_bytes:
+                break
+            total -= entry['size']
+            del self._index[key]
+            try:
+                os.remove(os.path.join(self.path, key))
+            except FileNotFoundError:
+                pass
+
+    def _load_index(self) -> dict:
+        try:
+            with open(os.path.join(self.path, INDEX_FILE), 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_index(self):
+        os.makedirs(self.path, exist_ok=True)
+        tmp = os.path.join(self.path, INDEX_FILE + '.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(self._index, f)
+        os.replace(tmp, os.path.join(self.path, INDEX_FILE))
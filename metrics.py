@@ -0,0 +1,106 @@
+import time
+import cProfile
+from collections import deque
+
+METRICS_WINDOW = 50  # Samples kept per stage and widget, percentiles are over these
+PROFILE_PATH = "./bs-viz-profile-{stamp}.prof"  # Where a profiled Fetch All run is dumped, read with pstats
+
+# Stages of a widget update, in pipeline order
+STAGE_NETWORK = 'network'  # Request to last byte, as timed by aio
+STAGE_PARSE = 'parse'  # Soup and index built by the DocumentCache, on a fetch thread
+STAGE_EXTRACT = 'extract'  # Filter run against the Document
+STAGE_VIEW = 'view'  # Display string of the output option, prettifying the page if the filter is empty
+STAGE_TRANSFORM = 'transform'  # Submitted to output received, queueing for a worker process included
+STAGE_LAYOUT = 'layout'  # Qt layout of the first chunk in the ScrollDisplay
+STAGES = (STAGE_NETWORK, STAGE_PARSE, STAGE_EXTRACT, STAGE_VIEW, STAGE_TRANSFORM, STAGE_LAYOUT)
+
+
+class Sample:
+    def __init__(self, seconds: float, nbytes: int = None, nodes: int = None):
+        self.seconds = seconds
+        self.nbytes = nbytes
+        self.nodes = nodes
+
+
+class StageMetrics:
+    """
+        Recent timings of one widget per pipeline stage, with the bytes and nodes each stage went through.
+
+        Only the last window samples of each stage are kept, so the percentiles follow the page as it changes.
+    """
+    def __init__(self, window=METRICS_WINDOW):
+        self.samples = {stage: deque(maxlen=window) for stage in STAGES}
+
+    def record(self, stage: str, seconds: float, nbytes: int = None, nodes: int = None):
+        self.samples[stage].append(Sample(seconds, nbytes, nodes))
+
+    def last(self, stage: str) -> Sample:
+        samples = self.samples[stage]
+        return samples[-1] if samples else None
+
+    def percentile(self, stage: str, q: float) -> float:
+        return percentile([sample.seconds for sample in self.samples[stage]], q)
+
+    def rows(self) -> list[tuple]:
+        """
+            (stage, count, last, p50, p95, bytes, nodes) of every stage with samples, seconds and
+            sizes being those of the last sample.
+        """
+        rows = []
+        for stage in STAGES:
+            last = self.last(stage)
+            if last is None:
+                continue
+            rows.append((stage, len(self.samples[stage]), last.seconds, self.percentile(stage, 50),
+                         self.percentile(stage, 95), last.nbytes, last.nodes))
+        return rows
+
+    def clear(self):
+        for samples in self.samples.values():
+            samples.clear()
+
+
+def percentile(values: list, q: float) -> float:
+    """
+        Nearest-rank percentile of values, None if there are none.
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    rank = max(int(-(-q * len(values) // 100)), 1)  # ceil
+    return values[min(rank, len(values)) - 1]
+
+
+class Profiler:
+    """
+        cProfile over a span of the GUI thread, e.g. a Fetch All run, dumped to a file on stop().
+
+        Fetches and parses run on worker threads, outside the profile; their wall time shows in the
+        network and parse stages of each widget's StageMetrics instead.
+    """
+    def __init__(self, path: str = None):
+        self.path = path
+        self.profile = None
+
+    @property
+    def is_running(self) -> bool:
+        return self.profile is not None
+
+    def start(self):
+        if self.profile is not None:
+            return
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def stop(self) -> str:
+        """
+            Stop profiling and write the stats. Return the path written to, None if it was not running.
+        """
+        if self.profile is None:
+            return None
+        self.profile.disable()
+        path = self.path or PROFILE_PATH.format(stamp=time.strftime('%Y%m%d-%H%M%S'))
+        self.profile.dump_stats(path)
+        self.profile = None
+        return path
+
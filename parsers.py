@@ -0,0 +1,96 @@
+import sys
+import time
+import argparse
+
+import engine
+from aio import get_engine
+
+CALIBRATE_REPEAT = 3  # Runs per backend, the fastest one counts
+
+
+class Timing:
+    """
+        How one parser backend did on a page: best parse + query time, and whether it extracted
+        what the reference backend did.
+    """
+    def __init__(self, parser, seconds, matches, same, error=None):
+        self.parser = parser
+        self.seconds = seconds
+        self.matches = matches
+        self.same = same
+        self.error = error
+
+    def __repr__(self):
+        if self.error is not None:
+            return f"{self.parser}: {self.error!r}"
+        return f"{self.parser}: {self.seconds * 1000:.1f} ms, {self.matches} matches{'' if self.same else ', differs'}"
+
+
+def calibrate(text: str, filter_text: str = '', filter_option: int = engine.FILTER_CSS, content_type: str = None,
+              collapse_nested: bool = False, repeat: int = CALIBRATE_REPEAT) -> list[Timing]:
+    """
+        Time every backend of engine.PARSERS parsing text and running the filter on it, fastest first.
+
+        Extractions are compared by their text, as the backends serialize markup slightly differently;
+        the reference is engine.PARSER_LXML, the default.
+    """
+    reference = None
+    timings = []
+    for parser in engine.PARSERS:
+        best = None
+        try:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                doc = engine.make_document(text, content_type=content_type, parser=parser)
+                result = doc.result(filter_text, filter_option, collapse_nested)
+                view = result.view(1)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+        except Exception as e:
+            timings.append(Timing(parser, None, 0, False, e))
+            continue
+
+        if parser == engine.PARSER_LXML:
+            reference = view
+        timings.append(Timing(parser, best, len(result.tags), reference is None or view == reference))
+
+    return sorted(timings, key=lambda t: (t.error is not None, t.seconds or 0))
+
+
+def recommend(timings: list[Timing]) -> str:
+    """
+        Return the fastest backend that extracts the same as the reference, the default if none does.
+    """
+    for timing in timings:
+        if timing.error is None and timing.same:
+            return timing.parser
+    return engine.PARSER_LXML
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the parser backends on a page and recommend one.")
+    parser.add_argument('source', help="URL or path of an HTML file")
+    parser.add_argument('-f', '--filter', default='', help="filter to time, the whole page if empty")
+    parser.add_argument('-m', '--mode', type=int, default=engine.FILTER_CSS,
+                        help="0 for CSS, 1 for Text, 2 for Selector")
+    parser.add_argument('-n', '--repeat', type=int, default=CALIBRATE_REPEAT)
+    args = parser.parse_args()
+
+    content_type = None
+    if '://' in args.source:
+        result = get_engine().fetch(args.source).result()
+        if not result.ok:
+            sys.exit(repr(result))
+        text, content_type = result.text, result.headers.get('Content-Type')
+    else:
+        with open(args.source, encoding='utf-8', errors='replace') as f:
+            text = f.read()
+
+    timings = calibrate(text, args.filter, args.mode, content_type, repeat=args.repeat)
+    for timing in timings:
+        print(timing)
+    print(f"Recommended: {recommend(timings)}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
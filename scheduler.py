@@ -0,0 +1,120 @@
+import time
+import random
+
+REFRESH_INTERVAL = 5 * 60  # Seconds between refreshes of a source, unless configured otherwise
+REFRESH_JITTER = 0.1  # Each delay is stretched or shrunk at random by up to this fraction
+REFRESH_CONCURRENCY = 4  # Scheduled refreshes in flight at once, across all sources
+BACKOFF_MAX = 60 * 60  # Longest delay after repeated failures, in seconds
+
+
+class ScheduleEntry:
+    """
+        Refresh state of one source.
+    """
+    def __init__(self, source, interval):
+        self.source = source
+        self.interval = interval
+        self.next_run = None
+        self.last_run = None
+        self.last_status = ""
+        self.failures = 0
+        self.running = False
+
+
+class RefreshScheduler:
+    """
+        Decides when each source is due for a refresh. It does not fetch anything itself:
+        due() hands out the sources to refresh now, done() is told how each refresh went.
+
+        Start times are spread at random over the first interval so sources loaded together do not
+        refresh together. Failures back off exponentially up to BACKOFF_MAX, and at most concurrency
+        refreshes are handed out before done() is called for them.
+    """
+    def __init__(self, concurrency=REFRESH_CONCURRENCY, jitter=REFRESH_JITTER, clock=time.monotonic):
+        self.concurrency = concurrency
+        self.jitter = jitter
+        self.clock = clock
+        self.entries = {}  # id(source) -> ScheduleEntry
+
+    def add(self, source, interval=REFRESH_INTERVAL):
+        entry = self.entries[id(source)] = ScheduleEntry(source, interval)
+        entry.next_run = self.clock() + random.random() * interval
+
+    def remove(self, source):
+        self.entries.pop(id(source), None)
+
+    def entry(self, source) -> ScheduleEntry:
+        return self.entries.get(id(source))
+
+    def set_interval(self, source, interval):
+        entry = self.entry(source)
+        if entry is None or entry.interval == interval:
+            return
+        entry.interval = interval
+        if not entry.running:
+            entry.next_run = min(entry.next_run, self.clock() + self._jittered(interval))
+
+    def restart(self):
+        """
+            Spread every source over its first interval again, e.g. when auto refresh is turned back on.
+        """
+        now = self.clock()
+        for entry in self.entries.values():
+            entry.failures = 0
+            entry.next_run = now + random.random() * entry.interval
+
+    def due(self) -> list:
+        """
+            Return the sources to refresh now, earliest first, within the concurrency budget.
+            They are marked running until done() is called for them.
+        """
+        now = self.clock()
+        budget = self.concurrency - sum(entry.running for entry in self.entries.values())
+        waiting = sorted((entry for entry in self.entries.values() if not entry.running and entry.next_run <= now),
+                         key=lambda entry: entry.next_run)
+
+        sources = []
+        for entry in waiting[:max(budget, 0)]:
+            entry.running = True
+            entry.last_run = now
+            sources.append(entry.source)
+        return sources
+
+    def is_running(self, source) -> bool:
+        entry = self.entry(source)
+        return entry is not None and entry.running
+
+    def done(self, source, ok: bool, status: str = ""):
+        """
+            Schedule the next refresh of source: one interval away, or further after consecutive failures.
+        """
+        entry = self.entry(source)
+        if entry is None:
+            return
+
+        entry.running = False
+        entry.last_status = status
+        entry.failures = 0 if ok else entry.failures + 1
+        delay = entry.interval if ok else min(entry.interval * 2 ** entry.failures, max(BACKOFF_MAX, entry.interval))
+        entry.next_run = self.clock() + self._jittered(delay)
+
+    def next_delay(self) -> float:
+        """
+            Seconds until the next source is due, None if there is nothing to wait for
+            or if the budget is used up, in which case the next done() frees a slot.
+        """
+        if sum(entry.running for entry in self.entries.values()) >= self.concurrency:
+            return None
+        pending = [entry.next_run for entry in self.entries.values() if not entry.running]
+        if not pending:
+            return None
+        return max(min(pending) - self.clock(), 0)
+
+    def queue(self) -> list:
+        """
+            Entries in the order they will run, those running now first.
+        """
+        return sorted(self.entries.values(), key=lambda entry: (not entry.running, entry.next_run))
+
+    def _jittered(self, delay):
+        return delay * (1 + self.jitter * (2 * random.random() - 1))
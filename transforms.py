@@ -0,0 +1,264 @@
+import atexit
+import pickle
+import hashlib
+import threading
+import multiprocessing
+from collections import deque, OrderedDict
+
+import engine
+
+TRANSFORM_WORKERS = 2
+TRANSFORM_TIMEOUT = 10  # Seconds a transform may run, from when its worker starts it, before that worker is killed
+MEMO_SIZE = 256  # Transform outputs kept, keyed by (input hash, input option, source hash)
+
+_runner = None
+_compiled = {}  # Worker process side: source -> compiled transform
+
+
+def _run(fn_src: str, x, input_option=engine.INPUT_TEXT):
+    """
+        Worker process entry point. Returns (ok, output) with output always a str,
+        so that any exception, picklable or not, makes it back to the app.
+        x is a transform payload, turned into the transform's argument here (JSON parse, DataFrame build).
+    """
+    try:
+        func = _compiled.get(fn_src)
+        if func is None:
+            func = _compiled[fn_src] = engine.compile_transform(fn_src)
+        return True, str(func(engine.transform_argument(x, input_option)))
+    except BaseException as e:
+        return False, repr(e)
+
+
+def _serve(conn):
+    """
+        Worker process loop: run each task received on conn, reporting when it starts and what it returned.
+    """
+    while True:
+        try:
+            fn_src, x, input_option = conn.recv()
+        except EOFError:
+            return
+        conn.send(('started', None))
+        conn.send(('done', _run(fn_src, x, input_option)))
+
+
+def digest(value) -> str:
+    if isinstance(value, str):
+        value = value.encode('utf-8')
+    elif not isinstance(value, bytes):
+        value = pickle.dumps(value)
+    return hashlib.sha1(value).hexdigest()
+
+
+class TransformJob:
+    """
+        Handle on one submitted transform. callback(output) is called from a background thread,
+        unless the job is cancelled first.
+    """
+    def __init__(self, key, fn_src, x, input_option, callback):
+        self.key = key
+        self.fn_src = fn_src
+        self.x = x
+        self.input_option = input_option
+        self.callback = callback
+        self.done = False
+        self.cancelled = False
+        self.timer = None
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class Worker:
+    """
+        One worker process and the runner thread driving it. The process takes (fn_src, x, input_option) tasks
+        over a pipe and answers each with ('started', None) once it picks the task up, then ('done', (ok, output)).
+    """
+    def __init__(self):
+        self.process = None  # Spawned by the worker's thread on its first task, not by the submitting thread
+        self.conn = None
+        self.job: TransformJob = None  # Job the process is on
+        self.retired = False  # Killed on timeout or shutdown, its thread exits and another worker takes its place
+
+    def start(self, ctx):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_serve, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+
+    def kill(self):
+        if self.process is not None:
+            self.process.kill()
+
+
+class TransformRunner:
+    """
+        Runs user transforms in worker processes, away from the GUI thread and its interpreter.
+
+        Each worker runs one transform at a time, and the timeout runs from when the worker reports it has
+        started it: time queued behind other transforms or waiting for a process to spawn does not count.
+        A transform running past the timeout has its own worker killed and replaced, other workers and their
+        transforms carry on. Outputs are memoized by (input hash, input option, source hash), so an unchanged
+        page or a repeated mode toggle costs a dict lookup.
+    """
+    def __init__(self, workers=TRANSFORM_WORKERS, timeout=TRANSFORM_TIMEOUT):
+        self.workers = workers
+        self.timeout = timeout
+
+        # spawn: the app runs Qt and fetch threads, which do not survive a fork
+        self._ctx = multiprocessing.get_context('spawn')
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)  # Idle workers wait on it for queued jobs
+        self._workers: list[Worker] = []
+        self._queue = deque()  # Jobs no worker has taken yet
+        self._memo = OrderedDict()
+
+    def submit(self, fn_src: str, x, callback, input_option: int = engine.INPUT_TEXT) -> TransformJob:
+        """
+            Run fn_src on x, a payload from engine.transform_payload(), calling callback(output) once done.
+            A memoized output is delivered immediately.
+        """
+        job = TransformJob((digest(x), input_option, digest(fn_src)), fn_src, x, input_option, callback)
+
+        with self._lock:
+            output = self._memo.get(job.key)
+            if output is not None:
+                self._memo.move_to_end(job.key)
+                job.done = True
+            else:
+                self._queue.append(job)
+                self._grow()
+                self._cond.notify()
+
+        if job.done:
+            callback(output)
+        return job
+
+    def shutdown(self):
+        with self._lock:
+            workers, self._workers = self._workers, []
+            jobs = list(self._queue) + [worker.job for worker in workers if worker.job is not None]
+            self._queue.clear()
+            for job in jobs:
+                job.cancel()
+                job.done = True
+                if job.timer is not None:
+                    job.timer.cancel()
+            for worker in workers:
+                worker.retired = True
+            self._cond.notify_all()
+        for worker in workers:
+            worker.kill()
+
+    def _grow(self):
+        # Under self._lock: add a worker when more jobs are queued than workers are idle, up to self.workers
+        idle = sum(1 for worker in self._workers if worker.job is None)
+        if len(self._queue) > idle and len(self._workers) < self.workers:
+            worker = Worker()
+            self._workers.append(worker)
+            threading.Thread(target=self._work, args=(worker,), daemon=True).start()
+
+    def _work(self, worker: Worker):
+        # Thread of one worker: take queued jobs one at a time and run each in the worker's process
+        while True:
+            with self._lock:
+                while not self._queue and not worker.retired:
+                    self._cond.wait()
+                if worker.retired:
+                    break
+                job = self._queue.popleft()
+                if job.cancelled:
+                    job.done = True
+                    continue
+                worker.job = job
+
+            try:
+                if worker.process is None:
+                    worker.start(self._ctx)
+                worker.conn.send((job.fn_src, job.x, job.input_option))
+                worker.conn.recv()
+                self._started(worker, job)
+                _, result = worker.conn.recv()
+            except (EOFError, OSError):
+                # Killed on timeout or shutdown, or the process died mid-transform
+                self._lost(worker, job)
+                break
+            except Exception as e:
+                # e.g. a payload that does not pickle, the process itself is fine
+                result = False, repr(e)
+            self._finish(worker, job, result)
+
+        if worker.conn is not None:
+            worker.conn.close()
+
+    def _started(self, worker: Worker, job: TransformJob):
+        with self._lock:
+            if job.done:
+                return
+            job.timer = threading.Timer(self.timeout, self._expire, (worker, job))
+            job.timer.daemon = True
+            job.timer.start()
+
+    def _finish(self, worker: Worker, job: TransformJob, result):
+        ok, output = result
+        with self._lock:
+            worker.job = None
+            if job.done:
+                return
+            job.done = True
+            if job.timer is not None:
+                job.timer.cancel()
+            if ok:
+                self._memo[job.key] = output
+                if len(self._memo) > MEMO_SIZE:
+                    self._memo.popitem(last=False)
+
+        if not job.cancelled:
+            job.callback(output)
+
+    def _expire(self, worker: Worker, job: TransformJob):
+        with self._lock:
+            if worker.job is not job or job.done:
+                return
+            job.done = True
+            worker.retired = True
+            if worker in self._workers:
+                self._workers.remove(worker)
+            self._grow()
+
+        # Killing its process is the only way to stop a runaway transform, the worker's thread then exits
+        worker.kill()
+        if not job.cancelled:
+            job.callback(repr(TimeoutError(f"Transform ran longer than {self.timeout}s and was stopped.")))
+
+    def _lost(self, worker: Worker, job: TransformJob):
+        with self._lock:
+            worker.retired = True
+            if worker in self._workers:
+                self._workers.remove(worker)
+            lost = not job.done
+            if lost:
+                job.done = True
+                if job.timer is not None:
+                    job.timer.cancel()
+            self._grow()
+
+        worker.kill()
+        if lost and not job.cancelled:
+            code = None
+            if worker.process is not None:
+                worker.process.join(1)
+                code = worker.process.exitcode
+            job.callback(repr(RuntimeError(f"Transform worker process exited with code {code}.")))
+
+
+def get_runner() -> TransformRunner:
+    """
+        Return the process-wide TransformRunner, created on first use.
+    """
+    global _runner
+    if _runner is None:
+        _runner = TransformRunner()
+        atexit.register(_runner.shutdown)
+    return _runner